@@ -1,4 +1,6 @@
+import boto.exception
 import boto.s3.connection
+import concurrent.futures
 import munch
 import itertools
 import os
@@ -42,22 +44,50 @@ def choose_bucket_prefix(template, max_len=30):
             ),
         )
 
+def delete_keys(bucket, keys, batch_size=1000):
+    """
+    delete keys (or key versions) in multi-object delete batches, or one
+    request per key if the server does not implement it. Returns the
+    number of keys deleted; the first key that failed is raised as an
+    S3ResponseError, so AccessDenied can be handled like a single delete.
+    """
+    keys = iter(keys)
+    deleted = 0
+    while True:
+        batch = list(itertools.islice(keys, batch_size))
+        if not batch:
+            return deleted
+        try:
+            result = bucket.delete_keys(batch, quiet=True)
+        except boto.exception.S3ResponseError as e:
+            if e.error_code != 'NotImplemented':
+                raise
+            for key in batch:
+                # versioned listings include DeleteMarkers, which have no delete()
+                bucket.delete_key(key.name, version_id=key.version_id)
+            deleted += len(batch)
+            continue
+        for err in result.errors:
+            e = boto.exception.S3ResponseError(403 if err.code == 'AccessDenied' else 400,
+                    '{key}: {message}'.format(key=err.key, message=err.message))
+            e.error_code = err.code
+            raise e
+        deleted += len(batch)
+
 def nuke_bucket(bucket):
+    """
+    delete every key in bucket in multi-object delete batches, then the
+    bucket; returns the number of keys deleted
+    """
+    deleted = 0
     try:
         bucket.set_canned_acl('private')
         # TODO: deleted_cnt and the while loop is a work around for rgw
         # not sending the
         deleted_cnt = 1
         while deleted_cnt:
-            deleted_cnt = 0
-            for key in bucket.list():
-                print('Cleaning bucket {bucket} key {key}'.format(
-                    bucket=bucket,
-                    key=key,
-                    ))
-                key.set_canned_acl('private')
-                key.delete()
-                deleted_cnt += 1
+            deleted_cnt = delete_keys(bucket, bucket.list())
+            deleted += deleted_cnt
         bucket.delete()
     except boto.exception.S3ResponseError as e:
         # TODO workaround for buggy rgw that fails to send
@@ -71,14 +101,18 @@ def nuke_bucket(bucket):
             raise
         # seems like we're not the owner of the bucket; ignore
         pass
+    return deleted
 
-def nuke_prefixed_buckets():
+def nuke_prefixed_buckets(concurrency=16):
     for name, conn in list(s3.items()):
-        print('Cleaning buckets from connection {name}'.format(name=name))
-        for bucket in conn.get_all_buckets():
-            if bucket.name.startswith(prefix):
-                print('Cleaning bucket {bucket}'.format(bucket=bucket))
-                nuke_bucket(bucket)
+        buckets = [bucket for bucket in conn.get_all_buckets() if bucket.name.startswith(prefix)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            deleted = list(pool.map(nuke_bucket, buckets))
+        print('Cleaned {n} buckets ({keys} keys) from connection {name}'.format(
+            n=len(buckets),
+            keys=sum(deleted),
+            name=name,
+            ))
 
     print('Done with cleanup of test buckets.')
 
@@ -300,3 +334,89 @@ def assert_xml_equal(got, want):
     if not checker.check_output(want, got, 0):
         message = checker.output_difference(Example("", want), got, 0)
         raise AssertionError(message)
+
+def _xml_text(text):
+    if text is None:
+        return None
+    text = text.strip().replace("\n", "").replace("\r", "")
+    return text or None
+
+def canonical_xml_tree(xml):
+    """
+    Parse xml (str, bytes or an lxml element) once into nested
+    (tag, attributes, text, tail, children) tuples that compare equal when
+    normalize_xml() output would: namespaces are dropped from tags and
+    attributes, whitespace is stripped and children are sorted by tag
+    (keeping the order of siblings with the same tag).
+    """
+    if xml is None:
+        return None
+    if isinstance(xml, tuple):
+        return xml
+    if isinstance(xml, str):
+        xml = xml.encode('utf-8')
+    if isinstance(xml, bytes):
+        xml = etree.fromstring(xml)
+
+    def canonical(element):
+        children = [canonical(child) for child in element if isinstance(child.tag, str)]
+        children.sort(key=lambda child: child[0])
+        attributes = tuple(sorted((etree.QName(k).localname, v) for (k, v) in element.attrib.items()))
+        return (etree.QName(element).localname, attributes, _xml_text(element.text),
+                _xml_text(element.tail), tuple(children))
+
+    return canonical(xml)
+
+def xml_tree_diff(got, want, path=None):
+    """
+    List the differences between two canonical_xml_tree() trees, one
+    readable line per difference, addressed by an xpath-like path.
+    """
+    (tag, attributes, text, tail, children) = got
+    (want_tag, want_attributes, want_text, want_tail, want_children) = want
+    if path is None:
+        path = '/' + want_tag
+    if tag != want_tag:
+        return ['{}: got element {!r}'.format(path, tag)]
+
+    diff = []
+    for (name, got_value, want_value) in [
+            ('attributes', attributes, want_attributes),
+            ('text', text, want_text),
+            ('tail', tail, want_tail),
+            ]:
+        if got_value != want_value:
+            diff.append('{}: {} {!r} != wanted {!r}'.format(path, name, got_value, want_value))
+
+    got_index = {}
+    for child in children:
+        got_index.setdefault(child[0], []).append(child)
+    want_index = {}
+    for child in want_children:
+        want_index.setdefault(child[0], []).append(child)
+
+    for child_tag in sorted(set(got_index) | set(want_index)):
+        got_list = got_index.get(child_tag, [])
+        want_list = want_index.get(child_tag, [])
+        for i in range(max(len(got_list), len(want_list))):
+            child_path = '{}/{}[{}]'.format(path, child_tag, i + 1)
+            if i >= len(got_list):
+                diff.append('{}: missing'.format(child_path))
+            elif i >= len(want_list):
+                diff.append('{}: unexpected'.format(child_path))
+            else:
+                diff += xml_tree_diff(got_list[i], want_list[i], child_path)
+    return diff
+
+def assert_xml_tree_equal(got, want):
+    """
+    Like assert_xml_equal, but compares canonical_xml_tree() trees; got
+    and want may be XML documents or trees parsed already.
+    """
+    assert want is not None, 'Wanted XML cannot be None'
+    if got is None:
+        raise AssertionError('Got input to validate was None')
+    got = canonical_xml_tree(got)
+    want = canonical_xml_tree(want)
+    if got != want:
+        raise AssertionError('XML differs:\n' + '\n'.join(xml_tree_diff(got, want)))
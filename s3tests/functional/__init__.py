@@ -7,9 +7,14 @@ import itertools
 import os
 import random
 import string
-from http.client import HTTPConnection, HTTPSConnection
+import io
+import socket
+import threading
+import concurrent.futures
+from http.client import HTTPConnection, HTTPSConnection, RemoteDisconnected
 from urllib.parse import urlparse
 
+from .. import common
 from .utils import region_sync_meta
 
 s3 = munch.Munch()
@@ -18,6 +23,9 @@ targets = munch.Munch()
 
 # this will be assigned by setup()
 prefix = None
+benchmark_enabled = False
+benchmark_concurrency = 16
+cleanup_concurrency = 16
 
 calling_formats = dict(
     ordinary=boto.s3.connection.OrdinaryCallingFormat(),
@@ -32,6 +40,15 @@ def get_prefix():
 def is_slow_backend():
     return slow_backend
 
+def get_benchmark_enabled():
+    return benchmark_enabled
+
+def get_benchmark_concurrency():
+    return benchmark_concurrency
+
+def get_cleanup_concurrency():
+    return cleanup_concurrency
+
 def choose_bucket_prefix(template, max_len=30):
     """
     Choose a prefix for our test buckets, so they're easy to identify.
@@ -57,59 +74,82 @@ def choose_bucket_prefix(template, max_len=30):
         )
 
 
+def _list_bucket_keys(bucket):
+    try:
+        iterator = iter(bucket.list_versions())
+        # peek into iterator to issue list operation
+        try:
+            return itertools.chain([next(iterator)], iterator)
+        except StopIteration:
+            return iter([])  # empty iterator
+    except boto.exception.S3ResponseError as e:
+        # some S3 implementations do not support object
+        # versioning - fall back to listing without versions
+        if e.error_code != 'NotImplemented':
+            raise e
+        return iter(bucket.list())
+
+
+def nuke_bucket_on_conn(bucket):
+    """
+    delete every key version in bucket, then the bucket; returns the
+    number of keys deleted
+    """
+    deleted = 0
+    for i in range(2):
+        try:
+            deleted += common.delete_keys(bucket, _list_bucket_keys(bucket))
+            try:
+                bucket.delete()
+            except boto.exception.S3ResponseError as e:
+                # if DELETE times out, the retry may see NoSuchBucket
+                if e.error_code != 'NoSuchBucket':
+                    raise e
+                pass
+            return deleted
+        except boto.exception.S3ResponseError as e:
+            if e.error_code != 'AccessDenied':
+                print('GOT UNWANTED ERROR', e.error_code)
+                raise
+            # seems like we don't have permissions set appropriately, we'll
+            # modify permissions and retry
+            pass
+
+        bucket.set_canned_acl('private')
+    return deleted
+
+
 def nuke_prefixed_buckets_on_conn(prefix, name, conn):
     print('Cleaning buckets from connection {name} prefix {prefix!r}.'.format(
         name=name,
         prefix=prefix,
         ))
 
-    for bucket in conn.get_all_buckets():
-        print('prefix=',prefix)
-        if bucket.name.startswith(prefix):
-            print('Cleaning bucket {bucket}'.format(bucket=bucket))
-            success = False
-            for i in range(2):
-                try:
-                    try:
-                        iterator = iter(bucket.list_versions())
-                        # peek into iterator to issue list operation
-                        try:
-                            keys = itertools.chain([next(iterator)], iterator)
-                        except StopIteration:
-                            keys = []  # empty iterator
-                    except boto.exception.S3ResponseError as e:
-                        # some S3 implementations do not support object
-                        # versioning - fall back to listing without versions
-                        if e.error_code != 'NotImplemented':
-                            raise e
-                        keys = bucket.list();
-                    for key in keys:
-                        print('Cleaning bucket {bucket} key {key}'.format(
-                            bucket=bucket,
-                            key=key,
-                            ))
-                        # key.set_canned_acl('private')
-                        bucket.delete_key(key.name, version_id = key.version_id)
-                    try:
-                        bucket.delete()
-                    except boto.exception.S3ResponseError as e:
-                        # if DELETE times out, the retry may see NoSuchBucket
-                        if e.error_code != 'NoSuchBucket':
-                            raise e
-                        pass
-                    success = True
-                except boto.exception.S3ResponseError as e:
-                    if e.error_code != 'AccessDenied':
-                        print('GOT UNWANTED ERROR', e.error_code)
-                        raise
-                    # seems like we don't have permissions set appropriately, we'll
-                    # modify permissions and retry
-                    pass
-
-                if success:
-                    break
-
-                bucket.set_canned_acl('private')
+    buckets = [bucket for bucket in conn.get_all_buckets() if bucket.name.startswith(prefix)]
+
+    keys = 0
+    err = None
+    failed = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=get_cleanup_concurrency()) as pool:
+        futures = [(bucket, pool.submit(nuke_bucket_on_conn, bucket)) for bucket in buckets]
+        for (bucket, f) in futures:
+            try:
+                keys += f.result()
+            except Exception as e:
+                # keep cleaning the other buckets, raise the error at the end
+                print('Cleaning bucket {bucket} failed: {e}'.format(bucket=bucket.name, e=e))
+                failed += 1
+                if err is None:
+                    err = e
+
+    print('Cleaned {n} buckets ({keys} keys) from connection {name}, {failed} failed.'.format(
+        n=len(buckets) - failed,
+        keys=keys,
+        name=name,
+        failed=failed,
+        ))
+    if err:
+        raise err
 
 
 def nuke_prefixed_buckets(prefix):
@@ -126,7 +166,7 @@ def nuke_prefixed_buckets(prefix):
 		            nuke_prefixed_buckets_on_conn(prefix, name, conn)
 		
 		    # Then sync to propagate deletes to secondaries
-		    region_sync_meta(targets.main, targets.main.master.connection)
+		    region_sync_meta(targets.main, targets.main.master, prefix=prefix)
 		    print('region-sync in nuke_prefixed_buckets')
 		
 		    # Now delete remaining buckets on any other connection 
@@ -272,6 +312,9 @@ def setup():
     global prefix
     global targets
     global slow_backend
+    global benchmark_enabled
+    global benchmark_concurrency
+    global cleanup_concurrency
 
     try:
         template = cfg.get('fixtures', 'bucket prefix')
@@ -284,6 +327,21 @@ def setup():
     except (configparser.NoSectionError, configparser.NoOptionError):
         slow_backend = False
 
+    try:
+        benchmark_enabled = cfg.getboolean('benchmark', 'enabled')
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        benchmark_enabled = False
+
+    try:
+        benchmark_concurrency = cfg.getint('benchmark', 'concurrency')
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        benchmark_concurrency = 16
+
+    try:
+        cleanup_concurrency = cfg.getint('fixtures', 'cleanup concurrency')
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        cleanup_concurrency = 16
+
     # pull the default_region out, if it exists
     try:
         default_region = cfg.get('fixtures', 'default_region')
@@ -370,6 +428,10 @@ def teardown():
     # remove our buckets here also, to avoid littering
     nuke_prefixed_buckets(prefix=prefix)
 
+    stats = raw_connections.stats()
+    print('Raw request connections: {opened} opened, {reused} reused, {stale} stale.'.format(**stats))
+    raw_connections.close()
+
 
 bucket_counter = itertools.count(1)
 
@@ -456,6 +518,109 @@ def _make_bucket_request(method, bucket, body=None, authenticated=False, respons
     """
     return _make_request(method=method, bucket=bucket, key=None, body=body, authenticated=authenticated, response_headers=response_headers, request_headers=request_headers, expires_in=expires_in, path_style=path_style, timeout=timeout)
 
+class BufferedResponse(object):
+    """
+    The parts of an HTTPResponse the tests use, with the body already read
+    so the connection it came from can serve the next request.
+    """
+    def __init__(self, res):
+        self.status = res.status
+        self.reason = res.reason
+        self.version = res.version
+        self.msg = res.msg
+        self.headers = res.headers
+        self.will_close = res.will_close
+        self._body = io.BytesIO(res.read())
+
+    def read(self, amt=None):
+        return self._body.read(amt)
+
+    def getheader(self, name, default=None):
+        return self.msg.get(name, default)
+
+    def getheaders(self):
+        return list(self.msg.items())
+
+
+class RawConnectionPool(object):
+    """
+    Idle keep-alive connections for _make_raw_request. Plain http
+    connections are kept per resolved (address, port), so requests to
+    different names of the same server (like bucket website hostnames)
+    share them; https connections are kept per (host, port) so the
+    certificate is still checked against the name. At most max_idle
+    connections are kept per key. Counts how many connections were
+    opened and how many requests went over a reused one.
+    """
+    def __init__(self, max_idle=16):
+        self.lock = threading.Lock()
+        self.max_idle = max_idle
+        self.idle = {}
+        self.addresses = {}
+        self.opened = 0
+        self.reused = 0
+        self.stale = 0
+
+    def key(self, host, port, secure):
+        if secure:
+            return (host, port, secure)
+        with self.lock:
+            address = self.addresses.get((host, port))
+        if address is None:
+            address = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)[0][4][0]
+            with self.lock:
+                self.addresses[(host, port)] = address
+        return (address, port, secure)
+
+    def get(self, key, timeout):
+        with self.lock:
+            conns = self.idle.get(key)
+            if conns:
+                self.reused += 1
+                c = conns.pop()
+                c.timeout = timeout
+                if c.sock is not None:
+                    c.sock.settimeout(timeout)
+                return (c, True)
+            self.opened += 1
+        (host, port, secure) = key
+        if secure:
+            class_ = HTTPSConnection
+        else:
+            class_ = HTTPConnection
+        return (class_(host, port=port, timeout=timeout), False)
+
+    def put(self, key, c):
+        with self.lock:
+            conns = self.idle.setdefault(key, [])
+            if len(conns) < self.max_idle:
+                conns.append(c)
+                return
+        c.close()
+
+    def mark_stale(self):
+        with self.lock:
+            self.stale += 1
+
+    def stats(self):
+        with self.lock:
+            return munch.Munch(opened=self.opened, reused=self.reused, stale=self.stale)
+
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for c in conns:
+                    c.close()
+            self.idle = {}
+
+
+raw_connections = RawConnectionPool()
+
+
+def get_raw_connection_stats():
+    return raw_connections.stats()
+
+
 def _make_raw_request(host, port, method, path, body=None, request_headers=None, secure=False, timeout=None):
     """
     issue a request to a specific host & port, for a specified method, on a
@@ -464,23 +629,44 @@ def _make_raw_request(host, port, method, path, body=None, request_headers=None,
 
     This allows construction of special cases not covered by the bucket/key to
     URL mapping of _make_request/_make_bucket_request.
-    """
-    if secure:
-        class_ = HTTPSConnection
-    else:
-        class_ = HTTPConnection
 
+    Connections are kept alive and reused for later requests to the same
+    address & port; the returned response has its body read already.
+    """
     if request_headers is None:
         request_headers = {}
+    if not any(name.lower() == 'host' for name in request_headers):
+        # the pooled connection may be to the resolved address; send the
+        # Host header http.client would have sent for host
+        default_port = 443 if secure else 80
+        request_headers = dict(request_headers)
+        request_headers['Host'] = host if int(port) == default_port else '{}:{}'.format(host, port)
 
-    c = class_(host, port=port, timeout=timeout)
+    key = raw_connections.key(host, port, secure)
+    while True:
+        (c, reused) = raw_connections.get(key, timeout)
 
-    # TODO: We might have to modify this in future if we need to interact with
-    # how httplib.request handles Accept-Encoding and Host.
-    c.request(method, path, body=body, headers=request_headers)
+        try:
+            # TODO: We might have to modify this in future if we need to interact with
+            # how httplib.request handles Accept-Encoding and Host.
+            c.request(method, path, body=body, headers=request_headers)
+            res = BufferedResponse(c.getresponse())
+        except (RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            c.close()
+            if not reused:
+                raise
+            # the server closed the idle connection; retry on a new one
+            raw_connections.mark_stale()
+            continue
+        except Exception:
+            c.close()
+            raise
+        break
 
-    res = c.getresponse()
-    #c.close()
+    if res.will_close:
+        c.close()
+    else:
+        raw_connections.put(key, c)
 
     print(res.status, res.reason)
     return res
@@ -6,6 +6,7 @@ import string
 import random
 from pprint import pprint
 import time
+import concurrent.futures
 import boto.exception
 import socket
 
@@ -17,6 +18,7 @@ from nose.tools import timed
 from nose.plugins.skip import SkipTest
 
 from .. import common
+from .utils import print_benchmark_report
 
 from . import (
     get_new_bucket,
@@ -25,6 +27,8 @@ from . import (
     config,
     _make_raw_request,
     choose_bucket_prefix,
+    get_benchmark_enabled,
+    get_benchmark_concurrency,
     )
 
 IGNORE_FIELD = 'IGNORETHIS'
@@ -134,7 +138,7 @@ def _test_website_prep(bucket, xml_template, hardcoded_fields = {}, expect_fail=
 
     config_xmlold = ''
     try:
-        config_xmlold = common.normalize_xml(bucket.get_website_configuration_xml(), pretty_print=True)
+        config_xmlold = bucket.get_website_configuration_xml()
     except boto.exception.S3ResponseError as e:
         if str(e.status) == str(404) \
             and ('NoSuchWebsiteConfiguration' in e.body or 'NoSuchWebsiteConfiguration' in e.code or
@@ -145,7 +149,7 @@ def _test_website_prep(bucket, xml_template, hardcoded_fields = {}, expect_fail=
 
     try:
         bucket.set_website_configuration_xml(common.trim_xml(config_xmlnew))
-        config_xmlnew = common.normalize_xml(config_xmlnew, pretty_print=True)
+        config_treenew = common.canonical_xml_tree(config_xmlnew)
     except boto.exception.S3ResponseError as e:
         if expect_fail is not None:
             if isinstance(expect_fail, dict):
@@ -158,7 +162,7 @@ def _test_website_prep(bucket, xml_template, hardcoded_fields = {}, expect_fail=
     # We should figure out how to poll for changes better
     # WARNING: eu-west-1 as of 2015/06/22 was taking at least 4 seconds to propogate website configs, esp when you cycle between non-null configs
     time.sleep(0.1)
-    config_xmlcmp = common.normalize_xml(bucket.get_website_configuration_xml(), pretty_print=True)
+    config_xmlcmp = bucket.get_website_configuration_xml()
 
     #if config_xmlold is not None:
     #    print('old',config_xmlold.replace("\n",''))
@@ -167,7 +171,7 @@ def _test_website_prep(bucket, xml_template, hardcoded_fields = {}, expect_fail=
     #if config_xmlnew is not None:
     #    print('new',config_xmlnew.replace("\n",''))
     # Cleanup for our validation
-    common.assert_xml_equal(config_xmlcmp, config_xmlnew)
+    common.assert_xml_tree_equal(config_xmlcmp, config_treenew)
     #print("config_xmlcmp\n", config_xmlcmp)
     #eq (config_xmlnew, config_xmlcmp)
     f['WebsiteConfiguration'] = config_xmlcmp
@@ -1137,6 +1141,9 @@ for redirect_code in VALID_AMZ_REDIRECT:
 
 def routing_setup():
   check_can_test_website()
+  return _routing_bucket_setup()
+
+def _routing_bucket_setup():
   kwargs = {'obj':[]}
   bucket = get_new_bucket()
   kwargs['bucket'] = bucket
@@ -1176,8 +1183,16 @@ def routing_teardown(**kwargs):
 @common.with_setup_kwargs(setup=routing_setup, teardown=routing_teardown)
 #@timed(10)
 def routing_check(*args, **kwargs):
-    bucket = kwargs['bucket']
     args=args[0]
+    _routing_check(args, kwargs)
+
+def _routing_check(args, kwargs):
+    """
+    apply the routing case args to the bucket prepared in kwargs and check
+    the website response; returns the seconds spent applying the config and
+    evaluating the request
+    """
+    bucket = kwargs['bucket']
     #print(args)
     pprint(args)
     xml_fields = kwargs.copy()
@@ -1187,11 +1202,15 @@ def routing_check(*args, **kwargs):
     k.set_contents_from_string(str(args)+str(kwargs), policy='public-read')
 
     pprint(xml_fields)
+    start = time.perf_counter()
     f = _test_website_prep(bucket, WEBSITE_CONFIGS_XMLFRAG['IndexDocErrorDoc'], hardcoded_fields=xml_fields)
+    config_time = time.perf_counter() - start
     #print(f)
     config_xmlcmp = bucket.get_website_configuration_xml()
     config_xmlcmp = common.normalize_xml(config_xmlcmp, pretty_print=True) # For us to read
+    start = time.perf_counter()
     res = _website_request(bucket.name, args['url'])
+    request_time = time.perf_counter() - start
     print(config_xmlcmp)
     new_url = args['location']
     if new_url is not None:
@@ -1208,6 +1227,22 @@ def routing_check(*args, **kwargs):
         _website_expected_error_response(res, bucket.name, args['code'], IGNORE_FIELD, IGNORE_FIELD)
     else:
         assert(False)
+    return (config_time, request_time)
+
+def routing_pool_setup():
+  """
+  prepare one routing bucket per entry of ROUTING_RULES_TESTS, concurrently
+  """
+  if not get_benchmark_enabled():
+    raise SkipTest
+  check_can_test_website()
+  with concurrent.futures.ThreadPoolExecutor(max_workers=get_benchmark_concurrency()) as pool:
+    futures = [pool.submit(_routing_bucket_setup) for t in ROUTING_RULES_TESTS]
+    return {'pool': [f.result() for f in futures]}
+
+def routing_pool_teardown(**kwargs):
+  for bucket_kwargs in kwargs.get('pool', []):
+    routing_teardown(**bucket_kwargs)
 
 @attr('s3website_RoutingRules')
 @attr('s3website')
@@ -1217,3 +1252,37 @@ def test_routing_generator():
         if 'xml' in t and 'RoutingRules' in t['xml'] and len(t['xml']['RoutingRules']) > 0:
             t['xml']['RoutingRules'] = common.trim_xml(t['xml']['RoutingRules'])
         yield routing_check, t
+
+@attr('s3website_RoutingRules')
+@attr('s3website')
+@attr('benchmark')
+@common.with_setup_kwargs(setup=routing_pool_setup, teardown=routing_pool_teardown)
+def test_routing_parallel(**kwargs):
+    """
+    run every routing case at once, each against its own bucket from the
+    pool, instead of reconfiguring one bucket per case in turn
+    """
+    cases = []
+    for t in ROUTING_RULES_TESTS:
+        t = t.copy()
+        if 'xml' in t and 'RoutingRules' in t['xml'] and len(t['xml']['RoutingRules']) > 0:
+            t['xml'] = dict(t['xml'], RoutingRules=common.trim_xml(t['xml']['RoutingRules']))
+        cases.append(t)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=get_benchmark_concurrency()) as pool:
+        futures = [pool.submit(_routing_check, t, bucket_kwargs) for (t, bucket_kwargs) in zip(cases, kwargs['pool'])]
+        timings = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+
+    for (t, (config_time, request_time)) in zip(cases, timings):
+        print_benchmark_report('website_routing_case',
+            url=t['url'],
+            code=t['code'],
+            config_seconds=config_time,
+            request_seconds=request_time)
+    print_benchmark_report('website_routing',
+        cases=len(cases),
+        concurrency=get_benchmark_concurrency(),
+        seconds=elapsed,
+        cases_per_sec=len(cases) / elapsed)
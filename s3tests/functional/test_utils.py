@@ -1,6 +1,12 @@
+import boto.exception
+import munch
+from boto.s3.deletemarker import DeleteMarker
+from boto.s3.key import Key
 from nose.tools import eq_ as eq
 
+from .. import common
 from . import utils
+from .utils import assert_raises
 
 def test_generate():
     FIVE_MB = 5 * 1024 * 1024
@@ -9,3 +15,55 @@ def test_generate():
     eq(len(''.join(utils.generate_random(FIVE_MB - 1))), FIVE_MB - 1)
     eq(len(''.join(utils.generate_random(FIVE_MB))), FIVE_MB)
     eq(len(''.join(utils.generate_random(FIVE_MB + 1))), FIVE_MB + 1)
+
+def test_sync_meta_wait():
+    conf = munch.Munch(sync_agent_addr=None, sync_meta_wait=0)
+    eq(utils._sync_meta_wait(conf), 0)
+    conf.sync_agent_addr = 'localhost'
+    eq(utils._sync_meta_wait(conf), utils.DEFAULT_SYNC_META_WAIT)
+    conf.sync_meta_wait = 5
+    eq(utils._sync_meta_wait(conf), 5)
+
+class _NoMultiDeleteBucket(object):
+    def __init__(self):
+        self.deleted = []
+
+    def delete_keys(self, keys, quiet=False):
+        e = boto.exception.S3ResponseError(501, 'Not Implemented')
+        e.error_code = 'NotImplemented'
+        raise e
+
+    def delete_key(self, key_name, version_id=None):
+        self.deleted.append((key_name, version_id))
+
+def test_delete_keys_fallback_with_delete_marker():
+    bucket = _NoMultiDeleteBucket()
+    key = Key(bucket, 'foo')
+    key.version_id = 'v1'
+    marker = DeleteMarker(bucket, 'bar')
+    marker.version_id = 'v2'
+    eq(common.delete_keys(bucket, [key, marker]), 2)
+    eq(bucket.deleted, [('foo', 'v1'), ('bar', 'v2')])
+
+def test_xml_tree_child_order():
+    got = '<Config><B>2</B><A x="1">1</A><B>3</B></Config>'
+    want = '<Config>\n  <A x="1">1</A>\n  <B>2</B>\n  <B>3</B>\n</Config>'
+    eq(common.canonical_xml_tree(got), common.canonical_xml_tree(want))
+    common.assert_xml_tree_equal(got, want)
+
+def test_xml_tree_namespaces():
+    got = '<s3:Config xmlns:s3="http://s3.amazonaws.com/doc/2006-03-01/"><s3:A>1</s3:A></s3:Config>'
+    want = '<Config xmlns="http://example.com/other"><A>1</A></Config>'
+    common.assert_xml_tree_equal(got, want)
+    common.assert_xml_tree_equal(got, '<Config><A>1</A></Config>')
+
+def test_xml_tree_diff():
+    got = '<Config><A>1</A><B>2</B><B>4</B><D/></Config>'
+    want = '<Config><A>1</A><B>2</B><B>3</B><C/></Config>'
+    e = assert_raises(AssertionError, common.assert_xml_tree_equal, got, want)
+    eq(str(e).split('\n'), [
+        'XML differs:',
+        "/Config/B[2]: text '4' != wanted '3'",
+        '/Config/C[1]: missing',
+        '/Config/D[1]: unexpected',
+        ])
@@ -1,3 +1,4 @@
+import concurrent.futures
 import random
 import requests
 import string
@@ -5,6 +6,8 @@ import time
 
 from nose.tools import eq_ as eq
 
+from s3tests_boto3.functional.utils import print_benchmark_report
+
 def assert_raises(excClass, callableObj, *args, **kwargs):
     """
     Like unittest.TestCase.assertRaises, but returns the exception.
@@ -39,19 +42,67 @@ def generate_random(size, part_size=5*1024*1024):
         if (x == size):
             return
 
-# syncs all the regions except for the one passed in
-def region_sync_meta(targets, region):
+# how long to wait for a region with a sync agent but no sync_meta_wait
+DEFAULT_SYNC_META_WAIT = 60
+
+def _bucket_names(conn, prefix):
+    return set(b.name for b in conn.get_all_buckets()
+               if prefix is None or b.name.startswith(prefix))
+
+def _sync_meta_wait(conf):
+    if conf.sync_meta_wait:
+        return conf.sync_meta_wait
+    if conf.sync_agent_addr:
+        return DEFAULT_SYNC_META_WAIT
+    return 0
+
+def _region_sync_and_wait(target, master_buckets, prefix, poll_interval):
+    """
+    trigger the sync agent of one region, then poll it until its bucket
+    listing matches master_buckets or the sync wait has passed.
+    Returns the seconds until convergence, or None if it did not converge.
+    """
+    conf = target.conf
+    wait = _sync_meta_wait(conf)
+    start = time.perf_counter()
+    if conf.sync_agent_addr:
+        ret = requests.post('http://{addr}:{port}/metadata/incremental'.format(addr = conf.sync_agent_addr, port = conf.sync_agent_port))
+        eq(ret.status_code, 200)
+
+    while True:
+        elapsed = time.perf_counter() - start
+        if _bucket_names(target.connection, prefix) == master_buckets:
+            return elapsed
+        if elapsed >= wait:
+            return None
+        time.sleep(poll_interval)
+
+# syncs all the regions except for the one passed in, concurrently, and
+# waits until each has the same buckets as that region; reports and
+# returns the replication lag of each region by name (None if it did not
+# converge in time)
+def region_sync_meta(targets, region, prefix=None, poll_interval=0.1):
+    master = getattr(region, 'connection', region)
+    syncs = [(k, r) for (k, r) in targets.items()
+             if r != region and r.connection != master
+             and (r.conf.sync_agent_addr or r.conf.sync_meta_wait)]
+    if not syncs:
+        return {}
 
-    for (k, r) in targets.items():
-        if r == region:
-            continue
-        conf = r.conf
-        if conf.sync_agent_addr:
-            ret = requests.post('http://{addr}:{port}/metadata/incremental'.format(addr = conf.sync_agent_addr, port = conf.sync_agent_port))
-            eq(ret.status_code, 200)
-        if conf.sync_meta_wait:
-            time.sleep(conf.sync_meta_wait)
+    master_buckets = _bucket_names(master, prefix)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(syncs)) as pool:
+        futures = [(k, pool.submit(_region_sync_and_wait, r, master_buckets, prefix, poll_interval))
+                   for (k, r) in syncs]
+        lags = dict((k, f.result()) for (k, f) in futures)
 
+    for (k, r) in syncs:
+        print_benchmark_report('region_sync_lag',
+                region=k,
+                buckets=len(master_buckets),
+                converged=lags[k] is not None,
+                lag_seconds=lags[k] if lags[k] is not None else -1.0,
+                wait_seconds=_sync_meta_wait(r.conf))
+    return lags
 
 def get_grantee(policy, permission):
     '''
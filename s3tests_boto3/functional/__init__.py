@@ -2,7 +2,9 @@ import boto3
 from botocore import UNSIGNED
 from botocore.client import Config
 from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError
 from botocore.handlers import disable_signing
+import concurrent.futures
 import configparser
 import datetime
 import time
@@ -11,13 +13,19 @@ import munch
 import random
 import string
 import itertools
+import threading
 import urllib3
 
+from .raw_request import RawRequestEngine
+
 config = munch.Munch
 
 # this will be assigned by setup()
 prefix = None
 
+# this will be assigned by check_webidentity() when the local OIDC provider is used
+oidc_provider = None
+
 def get_prefix():
     assert prefix is not None
     return prefix
@@ -163,6 +171,68 @@ def nuke_prefixed_buckets(prefix, client=None):
 
     print('Done with cleanup of buckets in tests.')
 
+# generator functions that page through iam listings
+def list_roles(iam_client):
+    kwargs = {}
+    while True:
+        response = iam_client.list_roles(**kwargs)
+        for role in response['Roles']:
+            yield role['RoleName']
+        if not response.get('IsTruncated'):
+            break
+        kwargs['Marker'] = response['Marker']
+
+def list_role_policies(iam_client, role_name):
+    kwargs = {}
+    while True:
+        response = iam_client.list_role_policies(RoleName=role_name, **kwargs)
+        for policy in response['PolicyNames']:
+            yield policy
+        if not response.get('IsTruncated'):
+            break
+        kwargs['Marker'] = response['Marker']
+
+def nuke_role(iam_client, role_name):
+    for policy in list(list_role_policies(iam_client, role_name)):
+        iam_client.delete_role_policy(RoleName=role_name, PolicyName=policy)
+    iam_client.delete_role(RoleName=role_name)
+
+def nuke_roles_and_oidc_providers(iam_client, concurrency=16):
+    """
+    Delete every role (with its policies) and every OIDC provider,
+    concurrently. Returns lists of what was removed and what failed.
+    """
+    tasks = []
+    # list each kind on its own, so one failed listing doesn't leak the other
+    try:
+        for role_name in list_roles(iam_client):
+            tasks.append(('role', role_name, nuke_role, {'iam_client': iam_client, 'role_name': role_name}))
+    except (ClientError, BotoCoreError) as e:
+        print('Listing iam roles failed:', e)
+    try:
+        response = iam_client.list_open_id_connect_providers()
+        for provider in response['OpenIDConnectProviderList']:
+            tasks.append(('oidc provider', provider['Arn'], iam_client.delete_open_id_connect_provider,
+                          {'OpenIDConnectProviderArn': provider['Arn']}))
+    except (ClientError, BotoCoreError) as e:
+        print('Listing oidc providers failed:', e)
+
+    removed = []
+    failed = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [(kind, name, pool.submit(func, **kwargs)) for (kind, name, func, kwargs) in tasks]
+        for (kind, name, future) in futures:
+            try:
+                future.result()
+                removed.append((kind, name))
+            except (ClientError, BotoCoreError) as e:
+                failed.append((kind, name, e))
+
+    for (kind, name, e) in failed:
+        print('Failed to delete {} {}: {}'.format(kind, name, e))
+    print('Done with cleanup of iam: {} removed, {} failed.'.format(len(removed), len(failed)))
+    return (removed, failed)
+
 def setup():
     cfg = configparser.RawConfigParser()
     try:
@@ -195,6 +265,21 @@ def setup():
     proto = 'https' if config.default_is_secure else 'http'
     config.default_endpoint = "%s://%s:%d" % (proto, config.default_host, config.default_port)
 
+    # optional list of gateway endpoints (host:port, comma separated) that
+    # s3 clients are spread over, round-robin or pinned per worker thread
+    try:
+        endpoints = [e.strip() for e in cfg.get('DEFAULT', "endpoints").split(',') if e.strip()]
+        config.endpoints = ["%s://%s" % (proto, e) for e in endpoints]
+    except configparser.NoOptionError:
+        config.endpoints = [config.default_endpoint]
+
+    try:
+        config.endpoint_mode = cfg.get('DEFAULT', "endpoint_mode")
+    except configparser.NoOptionError:
+        config.endpoint_mode = 'round_robin'
+    if config.endpoint_mode not in ('round_robin', 'pinned'):
+        raise RuntimeError('endpoint_mode unknown: %r' % config.endpoint_mode)
+
     try:
         config.default_ssl_verify = cfg.getboolean('DEFAULT', "ssl_verify")
     except configparser.NoOptionError:
@@ -238,6 +323,22 @@ def setup():
     config.tenant_user_id = cfg.get('s3 tenant',"user_id")
     config.tenant_email = cfg.get('s3 tenant',"email")
 
+    # vars from the benchmark section
+    try:
+        config.benchmark_enabled = cfg.getboolean('benchmark', "enabled")
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        config.benchmark_enabled = False
+
+    try:
+        config.benchmark_concurrency = cfg.getint('benchmark', "concurrency")
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        config.benchmark_concurrency = 16
+
+    try:
+        config.benchmark_part_size = cfg.getint('benchmark', "part_size")
+    except (configparser.NoSectionError, configparser.NoOptionError):
+        config.benchmark_part_size = 5*1024*1024
+
     # vars from the fixtures section
     try:
         template = cfg.get('fixtures', "bucket prefix")
@@ -258,24 +359,14 @@ def teardown():
     nuke_prefixed_buckets(prefix=prefix)
     nuke_prefixed_buckets(prefix=prefix, client=alt_client)
     nuke_prefixed_buckets(prefix=prefix, client=tenant_client)
+    if oidc_provider is not None:
+        oidc_provider.stop()
     try:
-        iam_client = get_iam_client()
-        list_roles_resp = iam_client.list_roles()
-        for role in list_roles_resp['Roles']:
-            list_policies_resp = iam_client.list_role_policies(RoleName=role['RoleName'])
-            for policy in list_policies_resp['PolicyNames']:
-                del_policy_resp = iam_client.delete_role_policy(
-                                         RoleName=role['RoleName'],
-                                         PolicyName=policy
-                                        )
-            del_role_resp = iam_client.delete_role(RoleName=role['RoleName'])
-        list_oidc_resp = iam_client.list_open_id_connect_providers()
-        for oidcprovider in list_oidc_resp['OpenIDConnectProviderList']:
-            del_oidc_resp = iam_client.delete_open_id_connect_provider(
-                        OpenIDConnectProviderArn=oidcprovider['Arn']
-                    )
-    except:
-        pass
+        iam_client = get_iam_client(Config(signature_version='s3v4', max_pool_connections=16))
+    except (RuntimeError, configparser.Error):
+        # without a complete "iam" section no sts test could have created roles
+        return
+    nuke_roles_and_oidc_providers(iam_client)
 
 def check_webidentity():
     cfg = configparser.RawConfigParser()
@@ -290,6 +381,14 @@ def check_webidentity():
     if not cfg.has_section("webidentity"):
         raise RuntimeError('Your config file is missing the "webidentity" section!')
 
+    try:
+        local_provider = cfg.getboolean('webidentity', "local_provider")
+    except configparser.NoOptionError:
+        local_provider = False
+    if local_provider:
+        start_oidc_provider(cfg)
+        return
+
     config.webidentity_thumbprint = cfg.get('webidentity', "thumbprint")
     config.webidentity_aud = cfg.get('webidentity', "aud")
     config.webidentity_token = cfg.get('webidentity', "token")
@@ -298,24 +397,80 @@ def check_webidentity():
     config.webidentity_azp = cfg.get('webidentity', "azp")
     config.webidentity_user_token = cfg.get('webidentity', "user_token")
 
-def get_client(client_config=None):
+def start_oidc_provider(cfg):
+    """
+    Start the local OIDC provider stand-in (once) and derive the
+    webidentity settings from it instead of reading them from the config.
+    """
+    global oidc_provider
+    if oidc_provider is None:
+        # cryptography is only needed when the local provider is used
+        from .oidc import OIDCProvider
+        try:
+            realm = cfg.get('webidentity', "KC_REALM")
+        except configparser.NoOptionError:
+            realm = 's3-tests'
+        oidc_provider = OIDCProvider(realm=realm).start()
+
+    config.webidentity_thumbprint = oidc_provider.thumbprint
+    config.webidentity_aud = oidc_provider.client_id
+    config.webidentity_realm = oidc_provider.realm
+    config.webidentity_sub = 's3-tests-user'
+    config.webidentity_azp = oidc_provider.client_id
+    config.webidentity_token = oidc_provider.mint_token(sub=config.webidentity_sub)
+    config.webidentity_user_token = oidc_provider.mint_token(sub=config.webidentity_sub,
+            tags={'Department': ['Engineering', 'Marketing']})
+
+endpoint_counter = itertools.count()
+endpoint_local = threading.local()
+
+def get_endpoint():
+    """
+    Return the endpoint the next s3 client should use: the next one of the
+    configured endpoints in round_robin mode, or the one assigned to the
+    calling thread in pinned mode.
+    """
+    if len(config.endpoints) == 1:
+        return config.endpoints[0]
+    if config.endpoint_mode == 'pinned':
+        if not hasattr(endpoint_local, 'endpoint'):
+            # offset by pid so parallel test processes start on different nodes
+            index = (os.getpid() + next(endpoint_counter)) % len(config.endpoints)
+            endpoint_local.endpoint = config.endpoints[index]
+        return endpoint_local.endpoint
+    return config.endpoints[next(endpoint_counter) % len(config.endpoints)]
+
+def get_endpoints():
+    return config.endpoints
+
+def get_client(client_config=None, endpoint=None):
     if client_config == None:
         client_config = Config(signature_version='s3v4')
 
+    if endpoint == None:
+        endpoint = get_endpoint()
+
     client = boto3.client(service_name='s3',
                         aws_access_key_id=config.main_access_key,
                         aws_secret_access_key=config.main_secret_key,
-                        endpoint_url=config.default_endpoint,
+                        endpoint_url=endpoint,
                         use_ssl=config.default_is_secure,
                         verify=config.default_ssl_verify,
                         config=client_config)
     return client
 
+def get_benchmark_client(client_config=None, endpoint=None):
+    if client_config == None:
+        client_config = Config(signature_version='s3v4',
+                               max_pool_connections=config.benchmark_concurrency)
+
+    return get_client(client_config, endpoint)
+
 def get_v2_client():
     client = boto3.client(service_name='s3',
                         aws_access_key_id=config.main_access_key,
                         aws_secret_access_key=config.main_secret_key,
-                        endpoint_url=config.default_endpoint,
+                        endpoint_url=get_endpoint(),
                         use_ssl=config.default_is_secure,
                         verify=config.default_ssl_verify,
                         config=Config(signature_version='s3'))
@@ -374,7 +529,7 @@ def get_alt_client(client_config=None):
     client = boto3.client(service_name='s3',
                         aws_access_key_id=config.alt_access_key,
                         aws_secret_access_key=config.alt_secret_key,
-                        endpoint_url=config.default_endpoint,
+                        endpoint_url=get_endpoint(),
                         use_ssl=config.default_is_secure,
                         verify=config.default_ssl_verify,
                         config=client_config)
@@ -387,7 +542,7 @@ def get_tenant_client(client_config=None):
     client = boto3.client(service_name='s3',
                         aws_access_key_id=config.tenant_access_key,
                         aws_secret_access_key=config.tenant_secret_key,
-                        endpoint_url=config.default_endpoint,
+                        endpoint_url=get_endpoint(),
                         use_ssl=config.default_is_secure,
                         verify=config.default_ssl_verify,
                         config=client_config)
@@ -424,6 +579,13 @@ def get_bad_auth_client(aws_access_key_id='badauth'):
                         config=Config(signature_version='s3v4'))
     return client
 
+def get_raw_request_engine(signature_version='s3v4'):
+    return RawRequestEngine(config.default_host, config.default_port,
+                            config.main_access_key, config.main_secret_key,
+                            secure=config.default_is_secure,
+                            signature_version=signature_version,
+                            ssl_verify=config.default_ssl_verify)
+
 def get_svc_client(client_config=None, svc='s3'):
     if client_config == None:
         client_config = Config(signature_version='s3v4')
@@ -598,3 +760,15 @@ def get_iam_secret_key():
 
 def get_user_token():
     return config.webidentity_user_token
+
+def get_oidc_provider():
+    return oidc_provider
+
+def get_benchmark_enabled():
+    return config.benchmark_enabled
+
+def get_benchmark_concurrency():
+    return config.benchmark_concurrency
+
+def get_benchmark_part_size():
+    return config.benchmark_part_size
@@ -0,0 +1,216 @@
+import threading
+import time
+
+INFINITY = float('inf')
+
+class Operation(object):
+    """
+    One PUT, GET or DELETE of a key, as seen by the client that issued it.
+
+    value is the body written by a put, or the body returned by a get
+    (None if the key did not exist). call and ret are the times the
+    request was issued and answered; ret is INFINITY for a put or delete
+    whose outcome is unknown, as it may have taken effect any time later.
+    """
+    __slots__ = ('id', 'client', 'kind', 'key', 'value', 'call', 'ret')
+
+    def __init__(self, id, client, kind, key, value, call, ret):
+        self.id = id
+        self.client = client
+        self.kind = kind
+        self.key = key
+        self.value = value
+        self.call = call
+        self.ret = ret
+
+    def __repr__(self):
+        return 'Operation({client}: {kind} {key}={value!r} [{call:.6f}, {ret:.6f}])'.format(
+                client=self.client, kind=self.kind, key=self.key, value=self.value,
+                call=self.call, ret=self.ret)
+
+class History(object):
+    """
+    Thread-safe recorder of the operations of concurrent clients.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.operations = []
+
+    def record(self, client, kind, key, value, call, ret):
+        with self.lock:
+            op = Operation(len(self.operations), client, kind, key, value, call, ret)
+            self.operations.append(op)
+        return op
+
+    def run(self, client, kind, key, func, value=None):
+        """
+        Call func and record it as one operation. func returns the value
+        read for a get; if it raises, a get is dropped from the history and
+        a put or delete is recorded as possibly applied.
+        """
+        call = time.monotonic()
+        try:
+            result = func()
+        except Exception:
+            if kind != 'get':
+                self.record(client, kind, key, value, call, INFINITY)
+            raise
+        ret = time.monotonic()
+        if kind == 'get':
+            value = result
+        return self.record(client, kind, key, value, call, ret)
+
+def _register_step(state, op):
+    """
+    Sequential model of one key: returns (legal, new state).
+    """
+    if op.kind == 'put':
+        return (True, op.value)
+    if op.kind == 'delete':
+        return (True, None)
+    return (op.value == state, state)
+
+class _Entry(object):
+    __slots__ = ('op', 'index', 'is_call', 'match', 'prev', 'next')
+
+    def __init__(self, op, index, is_call):
+        self.op = op
+        self.index = index
+        self.is_call = is_call
+        self.match = None
+        self.prev = None
+        self.next = None
+
+def _make_entries(operations):
+    """
+    Build the doubly linked list of call and return events, in time order
+    with calls before returns at equal times; returns its sentinel head.
+    """
+    events = []
+    for (index, op) in enumerate(operations):
+        call = _Entry(op, index, True)
+        ret = _Entry(op, index, False)
+        call.match = ret
+        events.append((op.call, 0, call))
+        events.append((op.ret, 1, ret))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    head = _Entry(None, -1, False)
+    prev = head
+    for (t, order, entry) in events:
+        prev.next = entry
+        entry.prev = prev
+        prev = entry
+    return head
+
+def _lift(entry):
+    entry.prev.next = entry.next
+    if entry.next is not None:
+        entry.next.prev = entry.prev
+    match = entry.match
+    match.prev.next = match.next
+    if match.next is not None:
+        match.next.prev = match.prev
+
+def _unlift(entry):
+    match = entry.match
+    match.prev.next = match
+    if match.next is not None:
+        match.next.prev = match
+    entry.prev.next = entry
+    if entry.next is not None:
+        entry.next.prev = entry
+
+def check_key_linearizable(operations, initial=None, deadline=None):
+    """
+    Check the operations on one key against a register model, with the
+    Wing & Gong search and the memoization of linearized sets Lowe added
+    (as in Porcupine). Returns True, False, or None if deadline (a
+    time.monotonic() value) passed first.
+    """
+    head = _make_entries(operations)
+    entry = head.next
+    state = initial
+    linearized = 0
+    cache = set()
+    stack = []
+    steps = 0
+    while head.next is not None:
+        steps += 1
+        if deadline is not None and steps % 1024 == 0 and time.monotonic() > deadline:
+            return None
+        if entry.is_call:
+            (legal, new_state) = _register_step(state, entry.op)
+            if legal:
+                new_linearized = linearized | (1 << entry.index)
+                if (new_linearized, new_state) not in cache:
+                    cache.add((new_linearized, new_state))
+                    stack.append((entry, state))
+                    state = new_state
+                    linearized = new_linearized
+                    _lift(entry)
+                    entry = head.next
+                    continue
+            entry = entry.next
+        else:
+            # a return whose call we could not linearize yet: backtrack
+            if not stack:
+                return False
+            (entry, state) = stack.pop()
+            linearized &= ~(1 << entry.index)
+            _unlift(entry)
+            entry = entry.next
+    return True
+
+def check_linearizability(operations, time_limit=None):
+    """
+    Check a history for linearizability. Keys are independent registers,
+    so each is checked on its own. Returns a dict of key to True, False
+    or None (not decided within time_limit seconds overall).
+    """
+    by_key = {}
+    for op in operations:
+        by_key.setdefault(op.key, []).append(op)
+
+    deadline = None
+    if time_limit is not None:
+        deadline = time.monotonic() + time_limit
+    return dict((key, check_key_linearizable(ops, deadline=deadline))
+                for (key, ops) in sorted(by_key.items()))
+
+def check_read_your_writes(operations):
+    """
+    Find gets that miss the issuing client's own earlier put or delete:
+    the value read must be the client's write, or come from a write that
+    did not finish before the client's write began. Returns a list of
+    (get, own write) pairs that violate this.
+    """
+    writes_by_value = {}
+    deletes = {}
+    for op in operations:
+        if op.kind == 'put':
+            writes_by_value[(op.key, op.value)] = op
+        elif op.kind == 'delete':
+            deletes.setdefault(op.key, []).append(op)
+
+    violations = []
+    last_write = {}
+    for op in sorted(operations, key=lambda op: op.call):
+        own = last_write.get((op.client, op.key))
+        if op.kind in ('put', 'delete'):
+            if op.ret != INFINITY:
+                last_write[(op.client, op.key)] = op
+            continue
+        if own is None or own.ret > op.call:
+            continue
+        if op.value is None:
+            if own.kind == 'delete':
+                continue
+            candidates = deletes.get(op.key, [])
+        else:
+            if own.kind == 'put' and own.value == op.value:
+                continue
+            candidates = [writes_by_value[(op.key, op.value)]] if (op.key, op.value) in writes_by_value else []
+        if not any(w.ret >= own.call and w.call <= op.ret for w in candidates):
+            violations.append((op, own))
+    return violations
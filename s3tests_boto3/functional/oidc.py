@@ -0,0 +1,149 @@
+import base64
+import datetime
+import hashlib
+import http.server
+import json
+import threading
+import time
+import uuid
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def b64url_uint(value):
+    return b64url(value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+
+class OIDCProvider(object):
+    """
+    A local stand-in for an OpenID Connect identity provider such as
+    Keycloak. It serves the discovery and JWKS documents of one realm
+    under the same paths Keycloak uses, and mints RS256 signed tokens
+    with whatever claims a test asks for.
+    """
+    def __init__(self, host='localhost', port=8080, realm='s3-tests', client_id='s3-tests-client'):
+        self.host = host
+        self.port = port
+        self.realm = realm
+        self.client_id = client_id
+        self.kid = uuid.uuid4().hex
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+        now = datetime.datetime.utcnow()
+        self.cert = x509.CertificateBuilder() \
+            .subject_name(name) \
+            .issuer_name(name) \
+            .public_key(self.key.public_key()) \
+            .serial_number(x509.random_serial_number()) \
+            .not_valid_before(now - datetime.timedelta(days=1)) \
+            .not_valid_after(now + datetime.timedelta(days=365)) \
+            .sign(self.key, hashes.SHA256())
+        self.cert_der = self.cert.public_bytes(serialization.Encoding.DER)
+
+        self.server = None
+        self.thread = None
+
+    @property
+    def issuer(self):
+        return 'http://{}:{}/auth/realms/{}'.format(self.host, self.port, self.realm)
+
+    @property
+    def thumbprint(self):
+        """
+        SHA1 fingerprint of the signing certificate, as registered with
+        create_open_id_connect_provider()
+        """
+        return hashlib.sha1(self.cert_der).hexdigest().upper()
+
+    def discovery_document(self):
+        return {
+            'issuer': self.issuer,
+            'jwks_uri': self.issuer + '/protocol/openid-connect/certs',
+            'id_token_signing_alg_values_supported': ['RS256'],
+            'response_types_supported': ['code', 'id_token', 'token'],
+            'subject_types_supported': ['public'],
+            }
+
+    def jwks_document(self):
+        numbers = self.key.public_key().public_numbers()
+        return {
+            'keys': [{
+                'kid': self.kid,
+                'kty': 'RSA',
+                'alg': 'RS256',
+                'use': 'sig',
+                'n': b64url_uint(numbers.n),
+                'e': b64url_uint(numbers.e),
+                'x5c': [base64.b64encode(self.cert_der).decode('ascii')],
+                'x5t': b64url(hashlib.sha1(self.cert_der).digest()),
+                }],
+            }
+
+    def mint_token(self, sub, aud=None, azp=None, tags=None, expires_in=3600, **claims):
+        """
+        Return a signed JWT. tags is a dict of principal tags (tag name to
+        list of values) placed in the https://aws.amazon.com/tags claim.
+        """
+        now = int(time.time())
+        payload = {
+            'iss': self.issuer,
+            'sub': sub,
+            'aud': aud if aud is not None else self.client_id,
+            'azp': azp if azp is not None else self.client_id,
+            'iat': now,
+            'exp': now + expires_in,
+            'jti': uuid.uuid4().hex,
+            }
+        if tags is not None:
+            payload['https://aws.amazon.com/tags'] = {
+                'principal_tags': tags,
+                'transitive_tag_keys': list(tags.keys()),
+                }
+        payload.update(claims)
+
+        header = {'alg': 'RS256', 'typ': 'JWT', 'kid': self.kid}
+        signing_input = '{}.{}'.format(
+            b64url(json.dumps(header).encode('utf-8')),
+            b64url(json.dumps(payload).encode('utf-8')))
+        signature = self.key.sign(signing_input.encode('ascii'), padding.PKCS1v15(), hashes.SHA256())
+        return '{}.{}'.format(signing_input, b64url(signature))
+
+    def start(self):
+        documents = {
+            '/auth/realms/{}/.well-known/openid-configuration'.format(self.realm): self.discovery_document,
+            '/auth/realms/{}/protocol/openid-connect/certs'.format(self.realm): self.jwks_document,
+            }
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                document = documents.get(self.path.split('?')[0])
+                if document is None:
+                    self.send_error(404)
+                    return
+                body = json.dumps(document()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('', self.port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,147 @@
+import itertools
+import ssl
+import threading
+from http.client import HTTPConnection, HTTPSConnection
+from http.client import HTTPException
+from urllib.parse import quote
+
+import botocore.auth
+import botocore.awsrequest
+import botocore.credentials
+
+class RawResponse(object):
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+class RawRequestEngine(object):
+    """
+    Issue S3 requests signed by botocore's SigV2 ('s3') or SigV4 ('s3v4')
+    signers, with full control over the headers that go on the wire.
+
+    Each thread keeps one persistent connection per engine, so requests
+    do not pay for client setup or a TCP handshake, and one engine can
+    be shared by concurrently running cases.
+    """
+    def __init__(self, host, port, access_key, secret_key, secure=False, signature_version='s3v4', region='us-east-1', ssl_verify=False, timeout=None):
+        self.host = host
+        self.port = port
+        self.secure = secure
+        self.signature_version = signature_version
+        self.region = region
+        self.ssl_verify = ssl_verify
+        self.timeout = timeout
+        self.credentials = botocore.credentials.Credentials(access_key, secret_key)
+        self.local = threading.local()
+
+    @property
+    def netloc(self):
+        return '{}:{}'.format(self.host, self.port)
+
+    @property
+    def host_header(self):
+        """
+        The Host header botocore signs: the port is left out when it is
+        the default one for the scheme.
+        """
+        default_port = 443 if self.secure else 80
+        if int(self.port) == default_port:
+            return self.host
+        return self.netloc
+
+    def _connection(self, reconnect=False):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None and not reconnect:
+            return conn
+        if conn is not None:
+            conn.close()
+        if self.secure:
+            context = ssl.create_default_context()
+            if not self.ssl_verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            conn = HTTPSConnection(self.host, port=self.port, timeout=self.timeout, context=context)
+        else:
+            conn = HTTPConnection(self.host, port=self.port, timeout=self.timeout)
+        self.local.conn = conn
+        return conn
+
+    def sign(self, method, path, body, headers):
+        """
+        Return the headers of a request after signing it; the host and
+        content-length headers are included, so they can be removed too.
+        """
+        url = '{}://{}{}'.format('https' if self.secure else 'http', self.netloc, path)
+        request = botocore.awsrequest.AWSRequest(method=method, url=url, data=body, headers=headers)
+        if self.signature_version == 's3v4':
+            botocore.auth.S3SigV4Auth(self.credentials, 's3', self.region).add_auth(request)
+        else:
+            botocore.auth.HmacV1Auth(self.credentials).add_auth(request)
+
+        signed = [('Host', self.host_header)]
+        if body is not None and 'Content-Length' not in request.headers:
+            signed.append(('Content-Length', str(len(body))))
+        signed += list(request.headers.items())
+        return signed
+
+    def request(self, method, bucket, key=None, body=b'', headers=None, remove=None, query=''):
+        """
+        Sign and send one request. headers are added (or replaced) before
+        signing and again after, like the boto2 header tests do; header
+        names in remove are dropped before and after signing.
+        """
+        path = '/' + bucket
+        if key is not None:
+            path += '/' + quote(key)
+        if query:
+            path += '?' + query
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        headers = dict(headers or {})
+        remove = set(name.lower() for name in (remove or []))
+        unsigned = dict((name, value) for (name, value) in headers.items() if name.lower() not in remove)
+
+        signed = self.sign(method, path, body, unsigned)
+        replaced = remove | set(name.lower() for name in headers)
+        final = [(name, value) for (name, value) in signed if name.lower() not in replaced]
+        final += [(name, value) for (name, value) in headers.items() if name.lower() not in remove]
+
+        for attempt in range(2):
+            conn = self._connection(reconnect=attempt > 0)
+            try:
+                conn.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+                for (name, value) in final:
+                    conn.putheader(name, value)
+                conn.endheaders(body if body else None)
+                res = conn.getresponse()
+                data = res.read()
+                break
+            except (HTTPException, ConnectionError):
+                # the server closed our persistent connection; retry once on a fresh one
+                if attempt > 0:
+                    raise
+        if res.will_close:
+            self.local.conn = None
+            conn.close()
+        return RawResponse(res.status, res.reason, dict(res.getheaders()), data)
+
+def header_permutations(additions, removals=(), max_changes=2):
+    """
+    Generate (headers to add, headers to remove) cases combining up to
+    max_changes changes, with at most one change per header name.
+
+    additions maps a header name to the list of values to try.
+    """
+    changes = [('add', name, value) for (name, values) in sorted(additions.items()) for value in values]
+    changes += [('remove', name, None) for name in removals]
+    for count in range(1, max_changes + 1):
+        for combination in itertools.combinations(changes, count):
+            names = [name.lower() for (op, name, value) in combination]
+            if len(set(names)) != len(names):
+                continue
+            add = dict((name, value) for (op, name, value) in combination if op == 'add')
+            remove = [name for (op, name, value) in combination if op == 'remove']
+            yield (add, remove)
@@ -0,0 +1,465 @@
+import math
+import re
+
+class ReferenceQueryError(Exception):
+    pass
+
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<number>\d+\.\d*|\.\d+|\d+)
+    | (?P<string>'(?:[^']|'')*'|"[^"]*")
+    | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+    | (?P<op><=|>=|!=|<>|[-+*/%=<>(),;])
+    )""", re.VERBOSE)
+
+AGGREGATES = ('count', 'sum', 'min', 'max', 'avg')
+
+def tokenize(query):
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        m = TOKEN_RE.match(query, pos)
+        if m is None or m.end() == pos:
+            raise ReferenceQueryError('cannot tokenize query at: {!r}'.format(query[pos:]))
+        pos = m.end()
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == 'name':
+            value = value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+class Parser(object):
+    """
+    Recursive descent parser for the subset of the s3select SQL dialect
+    that the reference engine can evaluate. Produces a tree of tuples.
+    """
+    def __init__(self, query):
+        self.tokens = tokenize(query)
+        self.pos = 0
+
+    def peek(self, offset=0):
+        if self.pos + offset < len(self.tokens):
+            return self.tokens[self.pos + offset][1]
+        return None
+
+    def next(self):
+        if self.pos >= len(self.tokens):
+            raise ReferenceQueryError('unexpected end of query')
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def accept(self, value):
+        if self.peek() == value:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, value):
+        kind, got = self.next()
+        if got != value:
+            raise ReferenceQueryError('expected {!r}, got {!r}'.format(value, got))
+
+    def parse_select(self):
+        self.expect('select')
+        if self.accept('*'):
+            projections = None
+        else:
+            projections = [self.parse_expr()]
+            while self.accept(','):
+                projections.append(self.parse_expr())
+        self.expect('from')
+        self.expect('s3object')
+        where = None
+        if self.accept('where'):
+            where = self.parse_expr()
+        self.accept(';')
+        if self.pos != len(self.tokens):
+            raise ReferenceQueryError('unexpected token {!r}'.format(self.peek()))
+        return (projections, where)
+
+    def parse_expr(self):
+        node = self.parse_and()
+        while self.accept('or'):
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.accept('and'):
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.accept('not'):
+            return ('not', self.parse_not())
+        return self.parse_predicate()
+
+    def parse_predicate(self):
+        node = self.parse_additive()
+        op = self.peek()
+        if op in ('=', '!=', '<>', '<', '>', '<=', '>='):
+            self.next()
+            return ('cmp', '!=' if op == '<>' else op, node, self.parse_additive())
+        if op == 'is':
+            self.next()
+            negate = self.accept('not')
+            self.expect('null')
+            return ('isnull', negate, node)
+        negate = False
+        if op == 'not' and self.peek(1) in ('like', 'in', 'between'):
+            self.next()
+            negate = True
+            op = self.peek()
+        if op == 'like':
+            self.next()
+            kind, pattern = self.next()
+            if kind != 'string':
+                raise ReferenceQueryError('like needs a string pattern')
+            predicate = ('like', node, like_to_regex(unquote(pattern)))
+        elif op == 'in':
+            self.next()
+            self.expect('(')
+            values = [self.parse_additive()]
+            while self.accept(','):
+                values.append(self.parse_additive())
+            self.expect(')')
+            predicate = ('in', node, values)
+        elif op == 'between':
+            self.next()
+            low = self.parse_additive()
+            self.expect('and')
+            predicate = ('between', node, low, self.parse_additive())
+        else:
+            return node
+        if negate:
+            return ('not', predicate)
+        return predicate
+
+    def parse_additive(self):
+        node = self.parse_term()
+        while self.peek() in ('+', '-'):
+            node = ('arith', self.next()[1], node, self.parse_term())
+        return node
+
+    def parse_term(self):
+        node = self.parse_unary()
+        while self.peek() in ('*', '/', '%'):
+            node = ('arith', self.next()[1], node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        if self.accept('-'):
+            return ('arith', '-', ('literal', 0), self.parse_unary())
+        if self.accept('+'):
+            return self.parse_unary()
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, value = self.next()
+        if kind == 'number':
+            return ('literal', float(value) if '.' in value else int(value))
+        if kind == 'string':
+            return ('literal', unquote(value))
+        if value == '(':
+            node = self.parse_expr()
+            self.expect(')')
+            return node
+        if kind != 'name':
+            raise ReferenceQueryError('unexpected token {!r}'.format(value))
+        if value in ('true', 'false'):
+            return ('literal', value == 'true')
+        if value == 'null':
+            return ('literal', None)
+        if re.match(r'^_\d+$', value):
+            return ('column', int(value[1:]) - 1)
+        if value == 'cast':
+            self.expect('(')
+            node = self.parse_expr()
+            self.expect('as')
+            type_name = self.next()[1]
+            self.expect(')')
+            return ('cast', type_name, node)
+        if value in AGGREGATES:
+            self.expect('(')
+            if value == 'count' and self.accept('*'):
+                arg = None
+            else:
+                arg = self.parse_expr()
+            self.expect(')')
+            return ('aggregate', value, arg)
+        if value in ('int', 'integer', 'float', 'decimal', 'string', 'varchar', 'bool'):
+            # s3select also accepts int(x) as a shorthand for cast(x as int)
+            self.expect('(')
+            node = self.parse_expr()
+            self.expect(')')
+            return ('cast', value, node)
+        if value in ('lower', 'upper'):
+            self.expect('(')
+            node = self.parse_expr()
+            self.expect(')')
+            return ('func', value, node)
+        raise ReferenceQueryError('unsupported name {!r}'.format(value))
+
+def unquote(token):
+    if token[0] == '"':
+        return token[1:-1]
+    return token[1:-1].replace("''", "'")
+
+def like_to_regex(pattern):
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in pattern)
+    return re.compile('^' + regex + '$', re.DOTALL)
+
+def contains_aggregate(node):
+    if not isinstance(node, tuple):
+        return False
+    if node[0] == 'aggregate':
+        return True
+    for child in node[1:]:
+        if isinstance(child, list):
+            if any(contains_aggregate(c) for c in child):
+                return True
+        elif contains_aggregate(child):
+            return True
+    return False
+
+def cast_value(type_name, value):
+    if value is None:
+        return None
+    if type_name in ('int', 'integer'):
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                return None
+            try:
+                return int(value)
+            except ValueError:
+                return int(float(value))
+        return int(value)
+    if type_name in ('float', 'decimal'):
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                return None
+        return float(value)
+    if type_name in ('string', 'varchar'):
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        return str(value)
+    if type_name == 'bool':
+        if isinstance(value, str):
+            return value.strip().lower() in ('true', '1')
+        return bool(value)
+    raise ReferenceQueryError('unsupported cast to {!r}'.format(type_name))
+
+def coerce_pair(a, b):
+    # a string compared with a number is compared numerically, like s3select does
+    if isinstance(a, str) and isinstance(b, (int, float)) and not isinstance(b, bool):
+        a = cast_value('float', a)
+    elif isinstance(b, str) and isinstance(a, (int, float)) and not isinstance(a, bool):
+        b = cast_value('float', b)
+    return a, b
+
+def compare(op, a, b):
+    if a is None or b is None:
+        return None
+    a, b = coerce_pair(a, b)
+    if op == '=':
+        return a == b
+    if op == '!=':
+        return a != b
+    if op == '<':
+        return a < b
+    if op == '>':
+        return a > b
+    if op == '<=':
+        return a <= b
+    return a >= b
+
+def arith(op, a, b):
+    if a is None or b is None:
+        return None
+    a, b = coerce_pair(a, b)
+    if op == '+':
+        return a + b
+    if op == '-':
+        return a - b
+    if op == '*':
+        return a * b
+    if op == '/':
+        if isinstance(a, int) and isinstance(b, int):
+            # integer division truncates toward zero
+            q = abs(a) // abs(b)
+            return q if (a >= 0) == (b >= 0) else -q
+        return a / b
+    if isinstance(a, int) and isinstance(b, int):
+        # and so does the remainder, taking the sign of the dividend
+        r = abs(a) % abs(b)
+        return r if a >= 0 else -r
+    return math.fmod(a, b)
+
+def aggregate(name, values):
+    if name == 'count':
+        return len(values)
+    if not values:
+        return None
+    if name == 'sum':
+        return sum(values)
+    if name == 'min':
+        return min(values)
+    if name == 'max':
+        return max(values)
+    return float(sum(values)) / len(values)
+
+class Context(object):
+    def __init__(self, columns, rows, inner=None):
+        self.columns = columns
+        self.rows = rows
+        self.inner = inner
+
+class CsvTable(object):
+    """
+    A CSV object parsed once into per-column lists of field strings.
+    Queries are evaluated a column at a time against these lists.
+    """
+    def __init__(self, csv_obj, col_delim=",", record_delim="\n", header=False):
+        self.columns = []
+        self.num_rows = 0
+        records = csv_obj.split(record_delim)
+        if header and records:
+            records = records[1:]
+        for rec in records:
+            if len(rec) == 0:
+                continue
+            fields = rec.split(col_delim)
+            while len(self.columns) < len(fields):
+                self.columns.append([None] * self.num_rows)
+            for col, field in zip(self.columns, fields):
+                col.append(field)
+            for col in self.columns[len(fields):]:
+                col.append(None)
+            self.num_rows += 1
+
+    def column(self, pos):
+        """
+        return the values of column pos (1-based, like _1) as strings
+        """
+        return self.columns[pos - 1]
+
+    def int_column(self, pos):
+        return [cast_value('int', v) for v in self.column(pos)]
+
+    def query(self, query):
+        """
+        Evaluate query and return its result as a list of row tuples.
+        """
+        projections, where = Parser(query).parse_select()
+        ctx = Context(self.columns, self.num_rows)
+
+        if where is not None:
+            mask = self.evaluate(where, ctx)
+            selected = [i for i, keep in enumerate(mask) if keep]
+            ctx = Context([[col[i] for i in selected] for col in self.columns], len(selected))
+
+        if projections is None:
+            return list(zip(*ctx.columns)) if ctx.columns else []
+
+        if any(contains_aggregate(p) for p in projections):
+            out = Context(None, 1, inner=ctx)
+            return [tuple(self.evaluate(p, out)[0] for p in projections)]
+
+        vectors = [self.evaluate(p, ctx) for p in projections]
+        return list(zip(*vectors))
+
+    def evaluate(self, node, ctx):
+        """
+        Evaluate an expression tree over every row of ctx, returning a list.
+        """
+        kind = node[0]
+        n = ctx.rows
+        if kind == 'literal':
+            return [node[1]] * n
+        if kind == 'column':
+            if ctx.columns is None:
+                raise ReferenceQueryError('column referenced outside of an aggregate')
+            if node[1] >= len(ctx.columns):
+                return [None] * n
+            return ctx.columns[node[1]]
+        if kind == 'aggregate':
+            if ctx.inner is None:
+                raise ReferenceQueryError('nested aggregate')
+            name, arg = node[1], node[2]
+            if arg is None or (name == 'count' and arg[0] == 'literal'):
+                return [ctx.inner.rows] * n
+            inner = Context(ctx.inner.columns, ctx.inner.rows)
+            values = [v for v in self.evaluate(arg, inner) if v is not None]
+            return [aggregate(name, values)] * n
+        if kind == 'cast':
+            return [cast_value(node[1], v) for v in self.evaluate(node[2], ctx)]
+        if kind == 'func':
+            f = str.lower if node[1] == 'lower' else str.upper
+            return [None if v is None else f(v) for v in self.evaluate(node[2], ctx)]
+        if kind == 'arith':
+            return [arith(node[1], a, b) for a, b in zip(self.evaluate(node[2], ctx), self.evaluate(node[3], ctx))]
+        if kind == 'cmp':
+            return [compare(node[1], a, b) for a, b in zip(self.evaluate(node[2], ctx), self.evaluate(node[3], ctx))]
+        if kind == 'and':
+            return [a and b for a, b in zip(self.evaluate(node[1], ctx), self.evaluate(node[2], ctx))]
+        if kind == 'or':
+            return [a or b for a, b in zip(self.evaluate(node[1], ctx), self.evaluate(node[2], ctx))]
+        if kind == 'not':
+            return [None if v is None else not v for v in self.evaluate(node[1], ctx)]
+        if kind == 'isnull':
+            negate = node[1]
+            return [(v is None or v == '') != negate for v in self.evaluate(node[2], ctx)]
+        if kind == 'like':
+            regex = node[2]
+            return [None if v is None else regex.match(str(v)) is not None for v in self.evaluate(node[1], ctx)]
+        if kind == 'in':
+            value_vectors = [self.evaluate(v, ctx) for v in node[2]]
+            return [any(compare('=', v, c) for c in candidates)
+                    for v, candidates in zip(self.evaluate(node[1], ctx), zip(*value_vectors))]
+        if kind == 'between':
+            return [None if v is None else bool(compare('>=', v, lo)) and bool(compare('<=', v, hi))
+                    for v, lo, hi in zip(self.evaluate(node[1], ctx), self.evaluate(node[2], ctx), self.evaluate(node[3], ctx))]
+        raise ReferenceQueryError('cannot evaluate {!r}'.format(kind))
+
+def results_match(got, want, epsilon=0.000001):
+    """
+    Compare a csv result returned by s3select with rows from CsvTable.query();
+    numbers are compared with a relative epsilon, everything else as stripped text.
+    """
+    got_rows = [rec for rec in got.strip().split("\n") if rec.strip() != '']
+    if len(got_rows) != len(want):
+        return False
+    for got_row, want_row in zip(got_rows, want):
+        # trailing empty fields come from the trailing delimiter of each record
+        fields = got_row.rstrip(',').split(',')
+        want_row = list(want_row)
+        while want_row and want_row[-1] in (None, '') and len(want_row) > len(fields):
+            want_row.pop()
+        if len(fields) != len(want_row):
+            return False
+        for field, value in zip(fields, want_row):
+            field = field.strip()
+            if value is None:
+                if field not in ('', 'null'):
+                    return False
+            elif isinstance(value, bool):
+                if field.lower() != ('true' if value else 'false'):
+                    return False
+            elif isinstance(value, (int, float)):
+                try:
+                    number = float(field)
+                except ValueError:
+                    return False
+                if value == 0:
+                    if abs(number) > epsilon:
+                        return False
+                elif abs(1 - number / value) > epsilon:
+                    return False
+            elif field != str(value).strip():
+                return False
+    return True
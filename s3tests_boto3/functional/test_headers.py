@@ -2,18 +2,29 @@ import boto3
 from nose.tools import eq_ as eq
 from nose.plugins.attrib import attr
 import nose
+from nose.plugins.skip import SkipTest
 from botocore.exceptions import ClientError
 from email.utils import formatdate
+import time
 
 from .utils import assert_raises
 from .utils import _get_status_and_error_code
 from .utils import _get_status
+from .utils import print_benchmark_report
+from .utils import run_concurrently
+from .utils import timed_call
+from .utils import summarize_latencies
+
+from .raw_request import header_permutations
 
 from . import (
     get_client,
     get_v2_client,
     get_new_bucket,
     get_new_bucket_name,
+    get_raw_request_engine,
+    get_benchmark_enabled,
+    get_benchmark_concurrency,
     )
 
 def _add_header_create_object(headers, client=None):
@@ -791,3 +802,86 @@ def test_bucket_create_bad_date_before_epoch_aws2():
     status, error_code = _get_status_and_error_code(e.response)
     eq(status, 403)
     eq(error_code, 'AccessDenied')
+
+#
+# header permutations
+#
+
+# header values that do not change how the request body is framed, so
+# every permutation can share the engine's persistent connections
+PERMUTATION_ADDITIONS = {
+    'Content-MD5': ['YWJyYWNhZGFicmE=', 'rL0Y20zC+Fzt72VPzMSk2A==', '', 'not base64'],
+    'Content-Type': ['', 'text/plain', 'application/octet-stream; charset=\x7f'],
+    'Expect': ['200', ''],
+    'Cache-Control': ['', 'no-cache', 'max-age=-1'],
+    'x-amz-acl': ['private', 'public-read', 'bogus-acl'],
+    'x-amz-storage-class': ['STANDARD', 'BOGUS'],
+    'x-amz-meta-foo': ['', 'bar', 'x' * 2048],
+    'x-amz-date': ['Tue, 07 Jul 2010 21:53:04 GMT', 'Bad Date', ''],
+    'Date': ['Tue, 07 Jul 2030 21:53:04 GMT', 'Bad Date', ''],
+    }
+
+PERMUTATION_REMOVALS = ['Authorization', 'x-amz-date', 'x-amz-content-sha256', 'Date', 'Host']
+
+def _test_header_permutations(signature_version, max_changes=2):
+    """
+    PUT an object with every combination of up to max_changes header
+    additions/removals through one shared raw request engine, after
+    checking that an unmodified PUT succeeds. The server may accept or
+    reject each case, but must never fail with a 5xx.
+    """
+    bucket_name = get_new_bucket()
+    engine = get_raw_request_engine(signature_version)
+    concurrency = get_benchmark_concurrency()
+    cases = list(header_permutations(PERMUTATION_ADDITIONS, PERMUTATION_REMOVALS, max_changes))
+
+    # an unmodified request must succeed, or every case below is just
+    # measuring how fast the server rejects a badly signed request
+    res = engine.request('PUT', bucket_name, 'perm-control', body=b'bar')
+    eq(res.status, 200)
+
+    def put(i, add, remove):
+        key = 'perm{}'.format(i % 64)
+        return timed_call(engine.request, 'PUT', bucket_name, key, body=b'bar', headers=add, remove=remove)
+
+    start = time.perf_counter()
+    results = run_concurrently(put, [(i, add, remove) for (i, (add, remove)) in enumerate(cases)], concurrency)
+    elapsed = time.perf_counter() - start
+
+    statuses = {}
+    server_errors = []
+    for ((add, remove), (latency, res)) in zip(cases, results):
+        statuses[res.status] = statuses.get(res.status, 0) + 1
+        if res.status >= 500:
+            server_errors.append((add, remove, res.status))
+
+    print_benchmark_report('header_permutations',
+            signature_version=signature_version,
+            cases=len(cases),
+            concurrency=concurrency,
+            requests_per_min=len(cases) * 60.0 / elapsed,
+            statuses=','.join('{}:{}'.format(status, count) for (status, count) in sorted(statuses.items())),
+            **summarize_latencies([latency for (latency, res) in results]))
+    eq(server_errors, [])
+
+@tag('auth_common')
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='create w/permutations of added and removed headers, signed v4')
+@attr(assertion='never fails 5xx')
+@attr('benchmark')
+def test_object_create_header_permutations():
+    if not get_benchmark_enabled():
+        raise SkipTest
+    _test_header_permutations('s3v4')
+
+@tag('auth_aws2')
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='create w/permutations of added and removed headers, signed v2')
+@attr(assertion='never fails 5xx')
+@attr('benchmark')
+def test_object_create_header_permutations_aws2():
+    if not get_benchmark_enabled():
+        raise SkipTest
+    _test_header_permutations('s3')
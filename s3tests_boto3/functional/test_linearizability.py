@@ -0,0 +1,92 @@
+import random
+
+from nose.tools import eq_ as eq
+
+from .linearizability import History, INFINITY
+from .linearizability import check_linearizability, check_read_your_writes
+
+def _history(ops):
+    history = History()
+    for (client, kind, key, value, call, ret) in ops:
+        history.record(client, kind, key, value, call, ret)
+    return history.operations
+
+def test_linearizable_concurrent_writes():
+    # the read overlaps both writes, so it may see either
+    ops = _history([
+        (0, 'put', 'k', 'a', 0, 10),
+        (1, 'put', 'k', 'b', 1, 5),
+        (2, 'get', 'k', 'a', 2, 11),
+        (2, 'get', 'k', 'a', 12, 13),
+        ])
+    eq(check_linearizability(ops), {'k': True})
+
+def test_stale_read_not_linearizable():
+    ops = _history([
+        (0, 'put', 'k', 'a', 0, 1),
+        (0, 'put', 'k', 'b', 2, 3),
+        (1, 'get', 'k', 'a', 4, 5),
+        ])
+    eq(check_linearizability(ops), {'k': False})
+
+def test_read_after_delete():
+    ops = _history([
+        (0, 'put', 'k', 'a', 0, 1),
+        (0, 'delete', 'k', None, 2, 3),
+        (1, 'get', 'k', None, 4, 5),
+        (1, 'get', 'j', 'x', 4, 5),
+        ])
+    eq(check_linearizability(ops), {'j': False, 'k': True})
+
+def test_unknown_write_outcome():
+    # a put that failed may still take effect at any time later
+    ops = _history([
+        (0, 'put', 'k', 'a', 0, INFINITY),
+        (1, 'get', 'k', None, 1, 2),
+        (1, 'get', 'k', 'a', 3, 4),
+        ])
+    eq(check_linearizability(ops), {'k': True})
+
+def test_read_your_writes():
+    ops = _history([
+        (0, 'put', 'k', 'a', 0, 1),
+        (1, 'put', 'k', 'b', 2, 3),
+        (1, 'get', 'k', 'a', 4, 5),
+        (0, 'get', 'k', 'b', 4, 5),
+        ])
+    violations = check_read_your_writes(ops)
+    eq([(get.client, get.value, own.value) for (get, own) in violations], [(1, 'a', 'b')])
+
+def test_large_concurrent_history():
+    # 16 overlapping clients, each operation taking effect at a random
+    # point within its interval, so the history is linearizable
+    rand = random.Random(1)
+    client_time = [0.0] * 16
+    ops = []
+    for i in range(20000):
+        client = i % 16
+        call = client_time[client] + rand.random()
+        ret = call + 1 + rand.random() * 10
+        client_time[client] = ret
+        point = call + rand.random() * (ret - call)
+        kind = rand.choice(['put', 'get', 'get', 'delete'])
+        ops.append((point, client, kind, 'k{}'.format(rand.randrange(8)), 'v{}'.format(i), call, ret))
+    ops.sort()
+
+    history = History()
+    state = {}
+    for (point, client, kind, key, value, call, ret) in ops:
+        if kind == 'put':
+            state[key] = value
+        elif kind == 'delete':
+            state[key] = value = None
+        else:
+            value = state.get(key)
+        history.record(client, kind, key, value, call, ret)
+    results = check_linearizability(history.operations, time_limit=60)
+    eq(set(results.values()), set([True]))
+
+    stale = [op for op in history.operations if op.kind == 'get' and op.value is not None][500]
+    stale.value = 'never written'
+    results = check_linearizability(history.operations, time_limit=60)
+    eq(results[stale.key], False)
@@ -1,14 +1,18 @@
 import boto3
 import botocore.session
+from botocore.client import Config
 from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError
 from botocore.exceptions import ParamValidationError
 from nose.tools import eq_ as eq
+from nose.tools import ok_ as ok
 from nose.plugins.attrib import attr
 from nose.plugins.skip import SkipTest
 import isodate
 import email.utils
 import datetime
 import threading
+import concurrent.futures
 import re
 import pytz
 from collections import OrderedDict
@@ -35,6 +39,17 @@ from .utils import assert_raises
 from .utils import generate_random
 from .utils import _get_status_and_error_code
 from .utils import _get_status
+from .utils import run_concurrently
+from .utils import timed_call
+from .utils import summarize_latencies
+from .utils import percentile
+from .utils import print_benchmark_report
+from .utils import group_latencies
+from .utils import put_get_latencies
+
+from .linearizability import History
+from .linearizability import check_linearizability
+from .linearizability import check_read_your_writes
 
 from .policy import Policy, Statement, make_json_policy
 
@@ -72,6 +87,11 @@ from . import (
     get_main_kms_keyid,
     get_secondary_kms_keyid,
     get_svc_client,
+    get_benchmark_client,
+    get_benchmark_enabled,
+    get_benchmark_concurrency,
+    get_benchmark_part_size,
+    get_endpoints,
     nuke_prefixed_buckets,
     )
 
@@ -783,6 +803,140 @@ def test_bucket_list_delimiter_not_skip_special():
     eq(keys, key_names2)
     eq(prefixes, ['0/'])
 
+def _create_directory_tree(client, bucket_name, prefix, fanout, depth, files_per_dir, markers):
+    """
+    create a tree of 'directories' under prefix, fanout subdirectories
+    per level and depth levels deep, with files_per_dir objects in each
+    one; with markers, every directory below prefix also gets an explicit
+    'dir/' marker object. Returns a dict of directory -> subdirectories.
+    """
+    tree = {prefix: []}
+    level = [prefix]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            tree[parent] = ['{}d{}/'.format(parent, i) for i in range(fanout)]
+            next_level += tree[parent]
+        for child in next_level:
+            tree[child] = []
+        level = next_level
+
+    keys = ['{}f{}'.format(directory, i) for directory in tree for i in range(files_per_dir)]
+    if markers:
+        keys += [directory for directory in tree if directory != prefix]
+    run_concurrently(lambda key: client.put_object(Bucket=bucket_name, Key=key, Body=b''),
+            [(key,) for key in keys], get_benchmark_concurrency())
+    return tree
+
+def _list_directory(client, bucket_name, directory):
+    """
+    list one directory with Delimiter='/' page by page; returns
+    (keys, prefixes, per-page latencies)
+    """
+    keys = []
+    prefixes = []
+    latencies = []
+    marker = ''
+    while True:
+        (latency, response) = timed_call(client.list_objects, Bucket=bucket_name,
+                Prefix=directory, Delimiter='/', Marker=marker)
+        latencies.append(latency)
+        keys += _get_keys(response)
+        prefixes += _get_prefixes(response)
+        if not response['IsTruncated']:
+            break
+        marker = response.get('NextMarker') or max(keys[-1:] + prefixes[-1:])
+    return (keys, prefixes, latencies)
+
+def _test_list_delimiter_benchmark(name, fanout, depth, files_per_dir, markers, sample_dirs=100):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket()
+    client = get_benchmark_client()
+    prefix = 'tree/'
+    (build_time, tree) = timed_call(_create_directory_tree, client, bucket_name, prefix,
+            fanout, depth, files_per_dir, markers)
+
+    # the widest and deepest directories, then a random sample of the rest
+    directories = sorted(tree)
+    sample = [prefix, max(directories, key=len)]
+    sample += random.Random(len(directories)).sample(directories, min(sample_dirs, len(directories)))
+
+    list_latencies = []
+    page_latencies = []
+    for directory in sample:
+        (latency, (keys, prefixes, pages)) = timed_call(_list_directory, client, bucket_name, directory)
+        expected_keys = ['{}f{}'.format(directory, i) for i in range(files_per_dir)]
+        if markers and directory != prefix:
+            expected_keys.append(directory)
+        eq(sorted(keys), sorted(expected_keys))
+        eq(sorted(prefixes), sorted(tree[directory]))
+        list_latencies.append(latency)
+        page_latencies += pages
+
+    print_benchmark_report('list_delimiter',
+            tree=name,
+            fanout=fanout,
+            depth=depth,
+            files_per_dir=files_per_dir,
+            markers=markers,
+            objects=len(tree) * files_per_dir + (len(tree) - 1 if markers else 0),
+            build_seconds=build_time,
+            listings=len(sample),
+            pages=len(page_latencies),
+            page_p50=percentile(page_latencies, 50),
+            page_p99=percentile(page_latencies, 99),
+            **summarize_latencies(list_latencies))
+
+@attr(resource='bucket')
+@attr(method='get')
+@attr(operation='list a directory of 100k objects with delimiter')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_list_delimiter_benchmark_wide():
+    _test_list_delimiter_benchmark('wide', 0, 0, 100000, False)
+
+@attr(resource='bucket')
+@attr(method='get')
+@attr(operation='list every level of a 32 level deep path with delimiter')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_list_delimiter_benchmark_deep():
+    _test_list_delimiter_benchmark('deep', 1, 32, 10, False)
+
+@attr(resource='bucket')
+@attr(method='get')
+@attr(operation='list every level of a 32 level deep path with delimiter, with directory markers')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_list_delimiter_benchmark_deep_markers():
+    _test_list_delimiter_benchmark('deep', 1, 32, 10, True)
+
+@attr(resource='bucket')
+@attr(method='get')
+@attr(operation='list a directory of 10k subdirectories with delimiter')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_list_delimiter_benchmark_common_prefixes():
+    _test_list_delimiter_benchmark('common_prefixes', 10000, 1, 1, False)
+
+@attr(resource='bucket')
+@attr(method='get')
+@attr(operation='list a directory of 10k subdirectories with delimiter, with directory markers')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_list_delimiter_benchmark_common_prefixes_markers():
+    _test_list_delimiter_benchmark('common_prefixes', 10000, 1, 1, True)
+
+@attr(resource='bucket')
+@attr(method='get')
+@attr(operation='list directories of a 10-way, 3 level tree with delimiter')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_list_delimiter_benchmark_balanced():
+    _test_list_delimiter_benchmark('balanced', 10, 3, 10, False)
+
 @attr(resource='bucket')
 @attr(method='get')
 @attr(operation='list under prefix')
@@ -3434,6 +3588,89 @@ def test_post_object_empty_conditions():
     r = requests.post(url, files=payload, verify=get_config_ssl_verify())
     eq(r.status_code, 400)
 
+def _make_signed_post_payload(bucket_name, key, size, expires):
+    """
+    build the form fields of an authenticated POST upload of key, with a
+    policy of its own allowing exactly that key and size
+    """
+    policy_document = {"expiration": expires.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    "conditions": [
+    {"bucket": bucket_name},
+    {"key": key},
+    {"acl": "private"},
+    ["starts-with", "$Content-Type", "text/plain"],
+    ["content-length-range", 0, size]
+    ]
+    }
+
+    json_policy_document = json.JSONEncoder().encode(policy_document)
+    policy = base64.b64encode(bytes(json_policy_document, 'utf-8'))
+    signature = base64.b64encode(hmac.new(bytes(get_main_aws_secret_key(), 'utf-8'), policy, hashlib.sha1).digest())
+
+    return OrderedDict([ ("key" , key),("AWSAccessKeyId" , get_main_aws_access_key()),
+    ("acl" , "private"),("signature" , signature),("policy" , policy),
+    ("Content-Type" , "text/plain")])
+
+def _test_post_object_throughput(size, num_uploads):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket()
+    client = get_client()
+    url = _get_post_url(bucket_name)
+    concurrency = get_benchmark_concurrency()
+    expires = datetime.datetime.now(pytz.utc) + datetime.timedelta(seconds=+6000)
+    data = 'x' * size
+
+    (sign_time, payloads) = timed_call(lambda: [
+            _make_signed_post_payload(bucket_name, 'foo{}.txt'.format(i), size, expires)
+            for i in range(num_uploads)])
+
+    def upload(payload):
+        files = payload.copy()
+        files['file'] = data
+        (latency, r) = timed_call(_get_pooled_session().post, url, files=files)
+        eq(r.status_code, 204)
+        return latency
+
+    (elapsed, latencies) = timed_call(run_concurrently, upload, [(payload,) for payload in payloads], concurrency)
+
+    response = client.head_object(Bucket=bucket_name, Key='foo0.txt')
+    eq(response['ContentLength'], size)
+
+    print_benchmark_report('post_object',
+            size=size,
+            uploads=num_uploads,
+            concurrency=concurrency,
+            policies_per_sec=num_uploads / sign_time,
+            uploads_per_sec=num_uploads / elapsed,
+            mb_per_sec=num_uploads * size / elapsed / (1024*1024),
+            **summarize_latencies(latencies))
+
+@attr(resource='object')
+@attr(method='post')
+@attr(operation='concurrent authenticated browser based uploads of 1KB')
+@attr(assertion='succeeds')
+@attr('benchmark')
+def test_post_object_throughput_1kb():
+    _test_post_object_throughput(1024, 5000)
+
+@attr(resource='object')
+@attr(method='post')
+@attr(operation='concurrent authenticated browser based uploads of 256KB')
+@attr(assertion='succeeds')
+@attr('benchmark')
+def test_post_object_throughput_256kb():
+    _test_post_object_throughput(256*1024, 2000)
+
+@attr(resource='object')
+@attr(method='post')
+@attr(operation='concurrent authenticated browser based uploads of 4MB')
+@attr(assertion='succeeds')
+@attr('benchmark')
+def test_post_object_throughput_4mb():
+    _test_post_object_throughput(4*1024*1024, 200)
+
 @attr(resource='object')
 @attr(method='get')
 @attr(operation='get w/ If-Match: the latest ETag')
@@ -4092,6 +4329,79 @@ def test_object_raw_put_authenticated_expired():
     res = requests.put(url, data="foo", verify=get_config_ssl_verify()).__dict__
     eq(res['status_code'], 403)
 
+_session_local = threading.local()
+
+def _get_pooled_session():
+    """
+    requests.Session of the calling thread, so each benchmark worker keeps
+    its connections alive across requests
+    """
+    session = getattr(_session_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.verify = get_config_ssl_verify()
+        _session_local.session = session
+    return session
+
+def _timed_session_request(method, url, expected_status, data=None):
+    (latency, r) = timed_call(_get_pooled_session().request, method, url, data=data)
+    eq(r.status_code, expected_status)
+    return latency
+
+@attr(resource='object')
+@attr(method='get')
+@attr(operation='presigned GET/PUT URLs in bulk over pooled sessions')
+@attr(assertion='succeeds')
+@attr('benchmark')
+def test_presigned_url_benchmark():
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    num_urls = 10000
+    num_objects = 64
+    body = 'x' * 1024
+    bucket_name = get_new_bucket()
+    client = get_benchmark_client()
+    concurrency = get_benchmark_concurrency()
+    keys = ['obj{}'.format(i) for i in range(num_objects)]
+    run_concurrently(lambda key: client.put_object(Bucket=bucket_name, Key=key, Body=body),
+            [(key,) for key in keys], concurrency)
+
+    urls = {}
+    for (method, client_method) in [('GET', 'get_object'), ('PUT', 'put_object')]:
+        (sign_time, urls[method]) = timed_call(lambda: [
+                client.generate_presigned_url(ClientMethod=client_method,
+                    Params={'Bucket': bucket_name, 'Key': keys[i % num_objects]},
+                    ExpiresIn=3600, HttpMethod=method)
+                for i in range(num_urls)])
+        print_benchmark_report('presigned_url_sign',
+                method=method,
+                urls=num_urls,
+                seconds=sign_time,
+                urls_per_sec=num_urls / sign_time)
+
+    def header_get(i):
+        (latency, response) = timed_call(client.get_object, Bucket=bucket_name, Key=keys[i % num_objects])
+        response['Body'].read()
+        return latency
+
+    def header_put(i):
+        return timed_call(client.put_object, Bucket=bucket_name, Key=keys[i % num_objects], Body=body)[0]
+
+    for (method, signing, func, args_list) in [
+            ('GET', 'presigned', _timed_session_request, [('GET', url, 200) for url in urls['GET']]),
+            ('GET', 'header', header_get, [(i,) for i in range(num_urls)]),
+            ('PUT', 'presigned', _timed_session_request, [('PUT', url, 200, body) for url in urls['PUT']]),
+            ('PUT', 'header', header_put, [(i,) for i in range(num_urls)]),
+            ]:
+        (elapsed, latencies) = timed_call(run_concurrently, func, args_list, concurrency)
+        print_benchmark_report('presigned_url_request',
+                method=method,
+                signing=signing,
+                concurrency=concurrency,
+                requests_per_sec=len(latencies) / elapsed,
+                **summarize_latencies(latencies))
+
 def check_bad_bucket_name(bucket_name):
     """
     Attempt to create a bucket with a specified name, and confirm
@@ -7223,6 +7533,367 @@ def test_multipart_upload_contents():
     bucket_name = get_new_bucket()
     _do_test_multipart_upload_contents(bucket_name, 'mymultipart', 3)
 
+def _multipart_upload_parallel(client, bucket_name, key, num_parts, part_size, concurrency):
+    """
+    upload num_parts parts of part_size bytes each, concurrently;
+    every part carries the same random payload
+    return (upload_id, parts, payload)
+    """
+    payload = os.urandom(part_size)
+
+    response = client.create_multipart_upload(Bucket=bucket_name, Key=key)
+    upload_id = response['UploadId']
+
+    def upload(part_num):
+        response = client.upload_part(UploadId=upload_id, Bucket=bucket_name, Key=key, PartNumber=part_num, Body=payload)
+        return {'ETag': response['ETag'].strip('"'), 'PartNumber': part_num}
+
+    parts = run_concurrently(upload, [(part_num,) for part_num in range(1, num_parts+1)], concurrency)
+    return (upload_id, parts, payload)
+
+def _list_all_parts(client, bucket_name, key, upload_id, max_parts=1000):
+    """
+    page through list_parts() and return (parts, number of pages)
+    """
+    parts = []
+    pages = 0
+    marker = 0
+    while True:
+        response = client.list_parts(Bucket=bucket_name, Key=key, UploadId=upload_id, MaxParts=max_parts, PartNumberMarker=marker)
+        pages += 1
+        parts += response.get('Parts', [])
+        if not response['IsTruncated']:
+            break
+        marker = response['NextPartNumberMarker']
+    return (parts, pages)
+
+def _test_multipart_upload_scale(num_parts):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket()
+    client = get_benchmark_client()
+    concurrency = get_benchmark_concurrency()
+    part_size = get_benchmark_part_size()
+    key = 'mymultipart'
+
+    (upload_time, (upload_id, parts, payload)) = timed_call(_multipart_upload_parallel,
+            client, bucket_name, key, num_parts, part_size, concurrency)
+
+    (list_time, (listed, pages)) = timed_call(_list_all_parts, client, bucket_name, key, upload_id)
+    eq([part['PartNumber'] for part in listed], list(range(1, num_parts+1)))
+    part_etag = hashlib.md5(payload).hexdigest()
+    for part in listed:
+        eq(part['ETag'].strip('"'), part_etag)
+        eq(part['Size'], part_size)
+
+    (complete_time, response) = timed_call(client.complete_multipart_upload,
+            Bucket=bucket_name, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+
+    # the multipart etag is the md5 of the concatenated part digests, suffixed with the part count
+    digest = hashlib.md5(hashlib.md5(payload).digest() * num_parts).hexdigest()
+    eq(response['ETag'].strip('"'), '{}-{}'.format(digest, num_parts))
+
+    response = client.head_object(Bucket=bucket_name, Key=key)
+    eq(response['ContentLength'], num_parts * part_size)
+
+    print_benchmark_report('multipart_upload_scale',
+            parts=num_parts,
+            part_size=part_size,
+            concurrency=concurrency,
+            upload_seconds=upload_time,
+            upload_mb_per_sec=num_parts * part_size / upload_time / (1024*1024),
+            list_parts_pages=pages,
+            list_parts_seconds=list_time,
+            list_parts_per_sec=num_parts / list_time,
+            complete_seconds=complete_time)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='multi-part upload, list parts and complete with 100 parts')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_multipart_upload_scale_100():
+    _test_multipart_upload_scale(100)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='multi-part upload, list parts and complete with 1000 parts')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_multipart_upload_scale_1000():
+    _test_multipart_upload_scale(1000)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='multi-part upload, list parts and complete with 10000 parts')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_multipart_upload_scale_10000():
+    _test_multipart_upload_scale(10000)
+
+def _put_benchmark_object(client, bucket_name, key, size, multipart=True):
+    """
+    write a size-byte object made of one random part-sized payload repeated,
+    as a multipart upload of benchmark-sized parts (the last one shorter),
+    or as a single PUT; returns the payload, see _expected_range()
+    """
+    part_size = get_benchmark_part_size()
+    payload = os.urandom(min(part_size, size))
+    if not multipart or size <= part_size:
+        body = payload * (size // len(payload)) + payload[:size % len(payload)]
+        response = client.put_object(Bucket=bucket_name, Key=key, Body=body)
+        return (payload, response)
+
+    response = client.create_multipart_upload(Bucket=bucket_name, Key=key)
+    upload_id = response['UploadId']
+
+    def upload(part_num):
+        start = (part_num - 1) * part_size
+        body = payload[:min(part_size, size - start)]
+        response = client.upload_part(UploadId=upload_id, Bucket=bucket_name, Key=key, PartNumber=part_num, Body=body)
+        return {'ETag': response['ETag'].strip('"'), 'PartNumber': part_num}
+
+    num_parts = (size + part_size - 1) // part_size
+    parts = run_concurrently(upload, [(part_num,) for part_num in range(1, num_parts+1)], get_benchmark_concurrency())
+    response = client.complete_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+    return (payload, response)
+
+def _expected_range(payload, start, end):
+    """
+    bytes start..end (inclusive) of an object written by _put_benchmark_object()
+    """
+    first = start % len(payload)
+    count = end - start + 1
+    repeats = (first + count + len(payload) - 1) // len(payload)
+    return (payload * repeats)[first:first + count]
+
+def _get_copy_benchmark_client():
+    # large copies can take longer than the default read timeout
+    return get_benchmark_client(Config(signature_version='s3v4',
+                                       max_pool_connections=get_benchmark_concurrency(),
+                                       read_timeout=3600))
+
+def _test_copy_object_benchmark(size):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    client = _get_copy_benchmark_client()
+    src_bucket_name = get_new_bucket()
+    dest_bucket_name = get_new_bucket()
+    versioned_bucket_name = get_new_bucket()
+    check_configure_versioning_retry(versioned_bucket_name, "Enabled", "Enabled")
+
+    _put_benchmark_object(client, src_bucket_name, 'src', size)
+    (payload, response) = _put_benchmark_object(client, versioned_bucket_name, 'src', size)
+    version_id = response['VersionId']
+    # overwrite it, so the copies read an older version
+    _put_benchmark_object(client, versioned_bucket_name, 'src', 1)
+
+    num_copies = max(1, min(64, 256*1024*1024 // size))
+    for (mode, copy_source, dest) in [
+            ('same_bucket', {'Bucket': src_bucket_name, 'Key': 'src'}, src_bucket_name),
+            ('cross_bucket', {'Bucket': src_bucket_name, 'Key': 'src'}, dest_bucket_name),
+            ('versioned', {'Bucket': versioned_bucket_name, 'Key': 'src', 'VersionId': version_id}, dest_bucket_name),
+            ]:
+        latencies = []
+        for i in range(num_copies):
+            dest_key = '{}-copy{}'.format(mode, i)
+            (latency, response) = timed_call(client.copy_object, Bucket=dest, Key=dest_key, CopySource=copy_source)
+            latencies.append(latency)
+        response = client.head_object(Bucket=dest, Key=dest_key)
+        eq(response['ContentLength'], size)
+
+        print_benchmark_report('copy_object',
+                size=size,
+                mode=mode,
+                mb_per_sec=num_copies * size / sum(latencies) / (1024*1024),
+                **summarize_latencies(latencies))
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='copy 1KB object, same bucket, cross bucket and versioned source')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_copy_object_benchmark_1kb():
+    _test_copy_object_benchmark(1024)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='copy 1MB object, same bucket, cross bucket and versioned source')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_copy_object_benchmark_1mb():
+    _test_copy_object_benchmark(1024*1024)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='copy 64MB object, same bucket, cross bucket and versioned source')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_copy_object_benchmark_64mb():
+    _test_copy_object_benchmark(64*1024*1024)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='copy 1GB object, same bucket, cross bucket and versioned source')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_copy_object_benchmark_1gb():
+    _test_copy_object_benchmark(1024*1024*1024)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='copy 5GB object, same bucket, cross bucket and versioned source')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_copy_object_benchmark_5gb():
+    _test_copy_object_benchmark(5*1024*1024*1024)
+
+def _test_upload_part_copy_benchmark(size, part_sizes):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    client = _get_copy_benchmark_client()
+    concurrency = get_benchmark_concurrency()
+    src_bucket_name = get_new_bucket()
+    dest_bucket_name = get_new_bucket()
+    _put_benchmark_object(client, src_bucket_name, 'src', size)
+    copy_source = {'Bucket': src_bucket_name, 'Key': 'src'}
+
+    for part_size in part_sizes:
+        dest_key = 'copy-{}'.format(part_size)
+        response = client.create_multipart_upload(Bucket=dest_bucket_name, Key=dest_key)
+        upload_id = response['UploadId']
+
+        def copy_part(part_num):
+            start = (part_num - 1) * part_size
+            end = min(start + part_size, size) - 1
+            copy_source_range = 'bytes={start}-{end}'.format(start=start, end=end)
+            (latency, response) = timed_call(client.upload_part_copy, Bucket=dest_bucket_name, Key=dest_key,
+                    CopySource=copy_source, PartNumber=part_num, UploadId=upload_id, CopySourceRange=copy_source_range)
+            return (latency, {'ETag': response['CopyPartResult']['ETag'], 'PartNumber': part_num})
+
+        num_parts = (size + part_size - 1) // part_size
+        (elapsed, results) = timed_call(run_concurrently, copy_part,
+                [(part_num,) for part_num in range(1, num_parts+1)], concurrency)
+        parts = [part for (latency, part) in results]
+        (complete_time, response) = timed_call(client.complete_multipart_upload,
+                Bucket=dest_bucket_name, Key=dest_key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+
+        response = client.head_object(Bucket=dest_bucket_name, Key=dest_key)
+        eq(response['ContentLength'], size)
+
+        print_benchmark_report('upload_part_copy',
+                size=size,
+                part_size=part_size,
+                parts=num_parts,
+                concurrency=concurrency,
+                mb_per_sec=size / elapsed / (1024*1024),
+                complete_seconds=complete_time,
+                **summarize_latencies([latency for (latency, part) in results]))
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='parallel upload_part_copy of 1GB object at several part sizes')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_upload_part_copy_benchmark_1gb():
+    _test_upload_part_copy_benchmark(1024*1024*1024, [5*1024*1024, 16*1024*1024, 64*1024*1024, 256*1024*1024])
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='parallel upload_part_copy of 5GB object at several part sizes')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_upload_part_copy_benchmark_5gb():
+    _test_upload_part_copy_benchmark(5*1024*1024*1024, [16*1024*1024, 64*1024*1024, 256*1024*1024, 1024*1024*1024])
+
+def _random_ranges(rand, size, range_size, count, boundary=None):
+    """
+    count (start, end) ranges of range_size bytes at random offsets; with
+    boundary set, every range straddles a multiple of boundary instead
+    """
+    ranges = []
+    for i in range(count):
+        if boundary is None:
+            start = rand.randrange(0, size - range_size + 1)
+        else:
+            edge = boundary * rand.randrange(1, (size - 1) // boundary + 1)
+            start = min(max(edge - range_size // 2, 0), size - range_size)
+        ranges.append((start, start + range_size - 1))
+    return ranges
+
+def _test_ranged_get_benchmark(size, multipart, range_sizes, num_requests=2000, verify=False):
+    """
+    random-offset ranged GETs of each of range_sizes against one object,
+    at increasing concurrency; on a multipart object the ranges spanning
+    part boundaries are measured separately
+    """
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    concurrency_levels = sorted(set([1, 4, 16, get_benchmark_concurrency()]))
+    client = get_benchmark_client(Config(signature_version='s3v4',
+                                         max_pool_connections=max(concurrency_levels)))
+    bucket_name = get_new_bucket()
+    key = 'bigobj'
+    (payload, response) = _put_benchmark_object(client, bucket_name, key, size, multipart)
+    part_size = get_benchmark_part_size()
+    rand = random.Random(size)
+
+    def ranged_get(start, end):
+        r = 'bytes={s}-{e}'.format(s=start, e=end)
+        (latency, response) = timed_call(client.get_object, Bucket=bucket_name, Key=key, Range=r)
+        body = response['Body'].read()
+        eq(len(body), end - start + 1)
+        if verify:
+            eq(body, _expected_range(payload, start, end))
+        return latency
+
+    placements = [('random', None)]
+    if multipart and size > part_size:
+        placements.append(('part_boundary', part_size))
+
+    for range_size in range_sizes:
+        for (placement, boundary) in placements:
+            for concurrency in concurrency_levels:
+                ranges = _random_ranges(rand, size, range_size, num_requests, boundary)
+                (elapsed, latencies) = timed_call(run_concurrently, ranged_get, ranges, concurrency)
+                print_benchmark_report('ranged_get',
+                        size=size,
+                        multipart=multipart,
+                        range_size=range_size,
+                        placement=placement,
+                        concurrency=concurrency,
+                        iops=num_requests / elapsed,
+                        mb_per_sec=num_requests * range_size / elapsed / (1024*1024),
+                        **summarize_latencies(latencies))
+
+@attr(resource='object')
+@attr(method='get')
+@attr(operation='random ranged gets of a 256MB object written with a single put')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_ranged_get_benchmark_single_put():
+    _test_ranged_get_benchmark(256*1024*1024, False, [4*1024, 64*1024, 1024*1024])
+
+@attr(resource='object')
+@attr(method='get')
+@attr(operation='random ranged gets of a 1GB multipart object, incl. across part boundaries')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_ranged_get_benchmark_multipart():
+    _test_ranged_get_benchmark(1024*1024*1024, True, [4*1024, 64*1024, 1024*1024])
+
+@attr(resource='object')
+@attr(method='get')
+@attr(operation='random ranged gets of a 64MB multipart object, verifying content')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_ranged_get_benchmark_verify():
+    _test_ranged_get_benchmark(64*1024*1024, True, [64*1024, 1024*1024], num_requests=500, verify=True)
+
 @attr(resource='object')
 @attr(method='put')
 @attr(operation=' multi-part upload overwrites existing key')
@@ -7767,7 +8438,7 @@ class FakeFileVerifier(object):
     def write(self, data):
         size = len(data)
         if self.char == None:
-            self.char = data[0]
+            self.char = data[:1].decode()
         self.size += size
         eq(data.decode(), self.char*size)
 
@@ -7925,6 +8596,105 @@ def test_atomic_dual_write_4mb():
 def test_atomic_dual_write_8mb():
     _test_atomic_dual_write(1024*1024*8)
 
+def _atomic_stress_write(client, bucket_name, objname, file_size, char, num_writes):
+    """
+    overwrite the object num_writes times with <file_size> of char; returns
+    how many writes the server rejected as conflicting
+    """
+    conflicts = 0
+    for i in range(num_writes):
+        try:
+            client.put_object(Bucket=bucket_name, Key=objname, Body=FakeWriteFile(file_size, char))
+        except ClientError as e:
+            if _get_status(e.response) not in (409, 503):
+                raise
+            conflicts += 1
+    return conflicts
+
+def _atomic_stress_read(client, bucket_name, objname, file_size, num_reads):
+    """
+    read the whole object num_reads times, each in a single GET, and check
+    every read is <file_size> of one character; returns the characters read
+    """
+    chars = []
+    for i in range(num_reads):
+        fp_verify = FakeFileVerifier()
+        response = client.get_object(Bucket=bucket_name, Key=objname)
+        for chunk in response['Body'].iter_chunks(1024*1024):
+            fp_verify.write(chunk)
+        eq(fp_verify.size, file_size)
+        chars.append(fp_verify.char)
+    return chars
+
+def _test_atomic_stress(file_size, num_writers=8, num_readers=8, num_ops=16):
+    """
+    num_writers sessions each overwrite the same object with their own fill
+    character while num_readers sessions read it; no read may ever see a
+    mix of two writes
+    """
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket()
+    objname = 'testobj'
+    client = get_benchmark_client()
+    fill_chars = string.ascii_uppercase[:num_writers]
+    client.put_object(Bucket=bucket_name, Key=objname, Body=FakeWriteFile(file_size, fill_chars[0]))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_writers + num_readers) as pool:
+        start = time.perf_counter()
+        writers = [pool.submit(_atomic_stress_write, client, bucket_name, objname, file_size, char, num_ops)
+                   for char in fill_chars]
+        readers = [pool.submit(_atomic_stress_read, client, bucket_name, objname, file_size, num_ops)
+                   for i in range(num_readers)]
+        conflicts = sum(f.result() for f in writers)
+        reads = [f.result() for f in readers]
+        elapsed = time.perf_counter() - start
+
+    for chars in reads:
+        for char in chars:
+            ok(char in fill_chars, 'read unexpected fill character %r' % char)
+
+    # how often consecutive reads of one session saw a different writer
+    switches = sum(1 for chars in reads for (a, b) in zip(chars, chars[1:]) if a != b)
+    num_writes = num_writers * num_ops
+    num_reads = num_readers * num_ops
+    print_benchmark_report('atomic_stress',
+            size=file_size,
+            writers=num_writers,
+            readers=num_readers,
+            seconds=elapsed,
+            write_mb_per_sec=(num_writes - conflicts) * file_size / elapsed / (1024*1024),
+            read_mb_per_sec=num_reads * file_size / elapsed / (1024*1024),
+            conflict_rate=conflicts / num_writes,
+            switch_rate=switches / max(num_reads - num_readers, 1))
+
+    _verify_atomic_key_data(bucket_name, objname, file_size)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='many writers and readers on one object')
+@attr(assertion='1MB reads are never torn')
+@attr('benchmark')
+def test_atomic_stress_1mb():
+    _test_atomic_stress(1024*1024)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='many writers and readers on one object')
+@attr(assertion='8MB reads are never torn')
+@attr('benchmark')
+def test_atomic_stress_8mb():
+    _test_atomic_stress(1024*1024*8)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='many writers and readers on one object')
+@attr(assertion='32MB reads are never torn')
+@attr('benchmark')
+def test_atomic_stress_32mb():
+    _test_atomic_stress(1024*1024*32, num_ops=4)
+
 def _test_atomic_conditional_write(file_size):
     """
     Create a file of A's, use it to set_contents_from_file.
@@ -8049,6 +8819,87 @@ def test_atomic_multipart_upload_write():
     body = _get_body(response)
     eq(body, 'bar')
 
+def _run_history_client(history, client_id, client, bucket_name, keys, num_ops, seed):
+    """
+    issue num_ops random PUT/GET/DELETE requests on keys, recording each
+    in history; every put writes a value no other operation writes
+    """
+    rand = random.Random(seed)
+
+    def get(key):
+        try:
+            response = client.get_object(Bucket=bucket_name, Key=key)
+        except ClientError as e:
+            if _get_status(e.response) == 404:
+                return None
+            raise
+        return _get_body(response)
+
+    for i in range(num_ops):
+        key = rand.choice(keys)
+        kind = rand.choice(['put', 'put', 'get', 'get', 'get', 'delete'])
+        try:
+            if kind == 'put':
+                value = 'c{}-{}'.format(client_id, i)
+                history.run(client_id, kind, key,
+                        lambda: client.put_object(Bucket=bucket_name, Key=key, Body=value), value)
+            elif kind == 'delete':
+                history.run(client_id, kind, key,
+                        lambda: client.delete_object(Bucket=bucket_name, Key=key))
+            else:
+                history.run(client_id, kind, key, lambda: get(key))
+        except (ClientError, BotoCoreError):
+            # recorded by history.run as an operation that may have applied
+            pass
+
+def _test_linearizability(num_clients, num_ops, num_keys=4):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket()
+    keys = ['key{}'.format(i) for i in range(num_keys)]
+    # spread the clients over every gateway endpoint
+    endpoints = get_endpoints()
+    clients = [get_client(endpoint=endpoints[i % len(endpoints)]) for i in range(num_clients)]
+    history = History()
+
+    ops_per_client = num_ops // num_clients
+    (run_time, results) = timed_call(run_concurrently, _run_history_client,
+            [(history, i, clients[i], bucket_name, keys, ops_per_client, i) for i in range(num_clients)],
+            num_clients)
+    (check_time, linearizable) = timed_call(check_linearizability, history.operations, 300)
+    violations = check_read_your_writes(history.operations)
+
+    print_benchmark_report('linearizability',
+            clients=num_clients,
+            endpoints=len(endpoints),
+            keys=num_keys,
+            operations=len(history.operations),
+            run_seconds=run_time,
+            check_seconds=check_time,
+            read_your_writes_violations=len(violations))
+    for (get, own) in violations[:10]:
+        print('read-your-writes violation:', get, 'after', own)
+    eq(violations, [])
+    # None means the check did not finish in time, False that it failed
+    eq(dict((key, result) for (key, result) in linearizable.items() if not result), {})
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='concurrent put/get/delete history on a few keys')
+@attr(assertion='history is linearizable')
+@attr('benchmark')
+def test_linearizability_1k_ops():
+    _test_linearizability(8, 1000)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='concurrent put/get/delete history on a few keys')
+@attr(assertion='history is linearizable')
+@attr('benchmark')
+def test_linearizability_20k_ops():
+    _test_linearizability(32, 20000)
+
 class Counter:
     def __init__(self, default_val):
         self.val = default_val
@@ -11191,6 +12042,83 @@ def test_get_obj_tagging():
     response = client.get_object_tagging(Bucket=bucket_name, Key=key)
     eq(response['TagSet'], input_tagset['TagSet'])
 
+def _test_metadata_ops_benchmark(num_objects, num_tags, num_ops=10000):
+    """
+    populate num_objects small objects with user metadata and num_tags tags,
+    then measure HEAD, GET/PUT tagging and GET ACL over random objects
+    """
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket()
+    client = get_benchmark_client()
+    concurrency = get_benchmark_concurrency()
+    keys = ['obj{}'.format(i) for i in range(num_objects)]
+    metadata_dict = {'meta1': 'mymeta', 'meta2': 'x' * 64}
+    input_tagset = _create_simple_tagset(num_tags)
+
+    def populate(key):
+        client.put_object(Bucket=bucket_name, Key=key, Body='bar', Metadata=metadata_dict)
+        client.put_object_tagging(Bucket=bucket_name, Key=key, Tagging=input_tagset)
+
+    (populate_time, results) = timed_call(run_concurrently, populate, [(key,) for key in keys], concurrency)
+
+    def head(key):
+        response = client.head_object(Bucket=bucket_name, Key=key)
+        eq(response['Metadata'], metadata_dict)
+
+    def get_tagging(key):
+        response = client.get_object_tagging(Bucket=bucket_name, Key=key)
+        eq(len(response['TagSet']), num_tags)
+
+    def put_tagging(key):
+        client.put_object_tagging(Bucket=bucket_name, Key=key, Tagging=input_tagset)
+
+    def get_acl(key):
+        response = client.get_object_acl(Bucket=bucket_name, Key=key)
+        eq(len(response['Grants']), 1)
+
+    print_benchmark_report('metadata_populate',
+            objects=num_objects,
+            tags=num_tags,
+            objects_per_sec=num_objects / populate_time)
+
+    rand = random.Random(num_objects)
+    for (op, func) in [
+            ('head', head),
+            ('get_tagging', get_tagging),
+            ('put_tagging', put_tagging),
+            ('get_acl', get_acl),
+            ]:
+        op_keys = [(rand.choice(keys),) for i in range(num_ops)]
+        (elapsed, latencies) = timed_call(run_concurrently,
+                lambda key: timed_call(func, key)[0], op_keys, concurrency)
+        print_benchmark_report('metadata_ops',
+                op=op,
+                objects=num_objects,
+                tags=num_tags,
+                concurrency=concurrency,
+                ops_per_sec=num_ops / elapsed,
+                **summarize_latencies(latencies))
+
+@attr(resource='object')
+@attr(method='head')
+@attr(operation='HEAD, tagging and ACL reads of 10k small objects with 2 tags')
+@attr(assertion='successful')
+@attr('tagging')
+@attr('benchmark')
+def test_metadata_ops_benchmark_2_tags():
+    _test_metadata_ops_benchmark(10000, 2)
+
+@attr(resource='object')
+@attr(method='head')
+@attr(operation='HEAD, tagging and ACL reads of 10k small objects with 10 tags')
+@attr(assertion='successful')
+@attr('tagging')
+@attr('benchmark')
+def test_metadata_ops_benchmark_10_tags():
+    _test_metadata_ops_benchmark(10000, 10)
+
 
 @attr(resource='object')
 @attr(method='get')
@@ -13528,3 +14456,33 @@ def test_delete_bucket_encryption():
 
     response = client.delete_bucket_encryption(Bucket=bucket_name)
     eq(response['ResponseMetadata']['HTTPStatusCode'], 204)
+
+@attr(resource='object')
+@attr(method='put')
+@attr(operation='put/get spread over 1..N gateway endpoints')
+@attr(assertion='successful')
+@attr('benchmark')
+def test_multi_endpoint_scaling():
+    endpoints = get_endpoints()
+    if not get_benchmark_enabled() or len(endpoints) < 2:
+        raise SkipTest
+
+    num_ops = 5000
+    bucket_name = get_new_bucket()
+    clients = [get_benchmark_client(endpoint=endpoint) for endpoint in endpoints]
+
+    for count in range(1, len(endpoints) + 1):
+        (elapsed, samples) = timed_call(put_get_latencies, clients[:count], bucket_name, num_ops,
+                get_benchmark_concurrency(), tags=endpoints[:count])
+        samples = [(endpoint, latency) for (endpoint, kind, latency) in samples]
+        for (endpoint, latencies) in sorted(group_latencies(samples).items()):
+            print_benchmark_report('multi_endpoint_node',
+                    endpoints=count,
+                    node=endpoint,
+                    ops_per_sec=len(latencies) / elapsed,
+                    **summarize_latencies(latencies))
+        print_benchmark_report('multi_endpoint',
+                endpoints=count,
+                concurrency=get_benchmark_concurrency(),
+                ops_per_sec=len(samples) / elapsed,
+                **summarize_latencies([latency for (endpoint, latency) in samples]))
@@ -1,16 +1,31 @@
 import nose
 import random
+import hashlib
 import string
 import re
+import time
+import bz2
+import zlib
 from nose.plugins.attrib import attr
+from nose.plugins.skip import SkipTest
 
 import uuid
 from nose.tools import eq_ as eq
 
 from . import (
-    get_client
+    get_client,
+    get_new_bucket,
+    get_new_bucket_name,
+    get_benchmark_client,
+    get_benchmark_enabled,
+    get_benchmark_concurrency,
     )
 
+from .s3select_reference import CsvTable, results_match
+from .utils import print_benchmark_report
+from .utils import run_concurrently
+from .utils import summarize_latencies
+
 import logging
 logging.basicConfig(level=logging.INFO)
 
@@ -24,8 +39,10 @@ def random_expr(depth):
     return '(' + random_expr(depth-1) + random.choice(['+','-','*','/']) + random_expr(depth-1) + ')'
 
 
-def generate_s3select_where_clause(bucket_name,obj_name):
+def make_s3select_where_clause():
 
+    # returns (statement, expected result) for a random where clause, or None
+    # when the generated expressions divide by zero
     a=random_expr(4)
     b=random_expr(4)
     s=random.choice([ '<','>','=','<=','>=','!=' ])
@@ -34,43 +51,63 @@ def generate_s3select_where_clause(bucket_name,obj_name):
         eval( a )
         eval( b )
     except ZeroDivisionError:
-        return
+        return None
 
     # generate s3select statement using generated randome expression
     # upon count(0)>0 it means true for the where clause expression
     # the python-engine {eval( conditional expression )} should return same boolean result.
     s3select_stmt =  "select count(0) from s3object where " + a + s + b + ";"
 
-    res = remove_xml_tags_from_result( run_s3select(bucket_name,obj_name,s3select_stmt) ).replace(",","")
-
     if  s == '=':
         s = '=='
 
-    s3select_assert_result(int(res)>0 , eval( a + s + b ))
+    return s3select_stmt, eval( a + s + b )
 
-def generate_s3select_expression_projection(bucket_name,obj_name):
+def make_s3select_expression_projection():
 
-        # generate s3select statement using generated randome expression
-        # statement return an arithmetical result for the generated expression.
-        # the same expression is evaluated by python-engine, result should be close enough(Epsilon)
-        
+        # returns (statement, expected result) for a random projection, or None
+        # when the expression divides by zero or evaluates to zero
         e = random_expr( 4 )
 
         try:
             eval( e )
         except ZeroDivisionError:
-            return
+            return None
 
         if eval( e ) == 0:
+            return None
+
+        return "select " + e + " from s3object;", eval( e )
+
+def generate_s3select_where_clause(bucket_name,obj_name):
+
+    generated = make_s3select_where_clause()
+    if generated is None:
+        return
+    s3select_stmt, expected = generated
+
+    res = remove_xml_tags_from_result( run_s3select(bucket_name,obj_name,s3select_stmt) ).replace(",","")
+
+    s3select_assert_result(int(res)>0 , expected)
+
+def generate_s3select_expression_projection(bucket_name,obj_name):
+
+        # generate s3select statement using generated randome expression
+        # statement return an arithmetical result for the generated expression.
+        # the same expression is evaluated by python-engine, result should be close enough(Epsilon)
+        
+        generated = make_s3select_expression_projection()
+        if generated is None:
             return
+        s3select_stmt, expected = generated
 
-        res = remove_xml_tags_from_result( run_s3select(bucket_name,obj_name,"select " + e + " from s3object;",) ).replace(",","")
+        res = remove_xml_tags_from_result( run_s3select(bucket_name,obj_name,s3select_stmt,) ).replace(",","")
 
         # accuracy level 
         epsilon = float(0.000001) 
 
         # both results should be close (epsilon)
-        assert (1 - (float(res.split("\n")[1]) / eval( e )) ) < epsilon
+        assert (1 - (float(res.split("\n")[1]) / expected) ) < epsilon
 
 @attr('s3select')
 def get_random_string():
@@ -113,131 +150,279 @@ def s3select_assert_result(a,b):
     
     nose.tools.assert_equal(a,b)
 
-def create_csv_object_for_datetime(rows,columns):
-        result = ""
-        for _ in range(rows):
-            row = ""
-            for _ in range(columns):
-                row = row + "{}{:02d}{:02d}T{:02d}{:02d}{:02d}Z,".format(random.randint(0,100)+1900,random.randint(1,12),random.randint(1,28),random.randint(0,23),random.randint(0,59),random.randint(0,59),)
-            result += row + "\n"
 
-        return result
+def csv_int_value(rand):
+    return "{}".format(rand.randint(0,1000))
 
-def create_random_csv_object(rows,columns,col_delim=",",record_delim="\n",csv_schema=""):
-        result = ""
-        if len(csv_schema)>0 :
-            result = csv_schema + record_delim
+def csv_string_value(rand):
+    if rand.randint(0,9) == 5:
+        return ''.join(rand.choice(string.ascii_letters) for m in range(10)) + "aeiou"
+    return ''.join("cbcd" + rand.choice(string.ascii_letters) for m in range(10)) + "vwxyzzvwxyz"
 
-        for _ in range(rows):
-            row = ""
-            for _ in range(columns):
-                row = row + "{}{}".format(random.randint(0,1000),col_delim)
-            result += row + record_delim
+def csv_trim_value(rand):
+    if rand.randint(0,5) == 2:
+        return "   aeiou    "
+    return "abcd"
 
-        return result
+def csv_escape_value(rand):
+    if rand.randint(0,9) == 5:
+        return "_ar"
+    return "aeio_"
 
-def create_random_csv_object_string(rows,columns,col_delim=",",record_delim="\n",csv_schema=""):
-        result = ""
-        if len(csv_schema)>0 :
-            result = csv_schema + record_delim
+def csv_null_value(rand):
+    if rand.randint(0,5) == 2:
+        return ""
+    return "abc"
 
-        for _ in range(rows):
-            row = ""
-            for _ in range(columns):
-                if random.randint(0,9) == 5:
-                    row = row + "{}{}".format(''.join(random.choice(string.ascii_letters) for m in range(10)) + "aeiou",col_delim)
-                else:
-                    row = row + "{}{}".format(''.join("cbcd" + random.choice(string.ascii_letters) for m in range(10)) + "vwxyzzvwxyz" ,col_delim)
-                
-            result += row + record_delim
-
-        return result
-
-def create_random_csv_object_trim(rows,columns,col_delim=",",record_delim="\n",csv_schema=""):
-        result = ""
+def csv_datetime_value(rand):
+    return "{}{:02d}{:02d}T{:02d}{:02d}{:02d}Z".format(rand.randint(0,100)+1900,rand.randint(1,12),rand.randint(1,28),rand.randint(0,23),rand.randint(0,59),rand.randint(0,59),)
+
+def create_csv_object_for_datetime(rows,columns,seed=None):
+        return ''.join(generate_csv_rows(rows,columns,csv_datetime_value,seed))
+
+def generate_csv_rows(rows,columns,value_func=csv_int_value,seed=None,col_delim=",",record_delim="\n",csv_schema=""):
+        # yields the csv object one record at a time; the same seed always yields the same records
+        rand = random.Random(seed)
         if len(csv_schema)>0 :
-            result = csv_schema + record_delim
+            yield csv_schema + record_delim
 
         for _ in range(rows):
-            row = ""
-            for _ in range(columns):
-                if random.randint(0,5) == 2:
-                    row = row + "{}{}".format(''.join("   aeiou    ") ,col_delim)
-                else:
-                    row = row + "{}{}".format(''.join("abcd") ,col_delim)
+            yield ''.join(value_func(rand) + col_delim for _ in range(columns)) + record_delim
 
+def generate_csv_chunks(rows,columns,value_func=csv_int_value,seed=None,col_delim=",",record_delim="\n",csv_schema="",chunk_size=1024*1024):
+        # yields the csv object as encoded chunks of about chunk_size bytes, so objects
+        # much larger than memory can be produced and uploaded
+        batch = []
+        batch_size = 0
+        for row in generate_csv_rows(rows,columns,value_func,seed,col_delim,record_delim,csv_schema):
+            batch.append(row)
+            batch_size += len(row)
+            if batch_size >= chunk_size:
+                yield ''.join(batch).encode('utf-8')
+                batch = []
+                batch_size = 0
 
-                
-            result += row + record_delim
+        if batch:
+            yield ''.join(batch).encode('utf-8')
 
-        return result
+def create_random_csv_object(rows,columns,col_delim=",",record_delim="\n",csv_schema="",seed=None):
+        return ''.join(generate_csv_rows(rows,columns,csv_int_value,seed,col_delim,record_delim,csv_schema))
 
-def create_random_csv_object_escape(rows,columns,col_delim=",",record_delim="\n",csv_schema=""):
-        result = ""
-        if len(csv_schema)>0 :
-            result = csv_schema + record_delim
+def create_random_csv_object_string(rows,columns,col_delim=",",record_delim="\n",csv_schema="",seed=None):
+        return ''.join(generate_csv_rows(rows,columns,csv_string_value,seed,col_delim,record_delim,csv_schema))
 
-        for _ in range(rows):
-            row = ""
-            for _ in range(columns):
-                if random.randint(0,9) == 5:
-                    row = row + "{}{}".format(''.join("_ar") ,col_delim)
-                else:
-                    row = row + "{}{}".format(''.join("aeio_")  ,col_delim)
-                
-            result += row + record_delim
-
-        return result
-
-def create_random_csv_object_null(rows,columns,col_delim=",",record_delim="\n",csv_schema=""):
-        result = ""
-        if len(csv_schema)>0 :
-            result = csv_schema + record_delim
+def create_random_csv_object_trim(rows,columns,col_delim=",",record_delim="\n",csv_schema="",seed=None):
+        return ''.join(generate_csv_rows(rows,columns,csv_trim_value,seed,col_delim,record_delim,csv_schema))
 
-        for _ in range(rows):
-            row = ""
-            for _ in range(columns):
-                if random.randint(0,5) == 2:
-                    row = row + "{}{}".format(''.join("") ,col_delim)
-                else:
-                    row = row + "{}{}".format(''.join("abc") ,col_delim)
-                
-            result += row + record_delim
+def create_random_csv_object_escape(rows,columns,col_delim=",",record_delim="\n",csv_schema="",seed=None):
+        return ''.join(generate_csv_rows(rows,columns,csv_escape_value,seed,col_delim,record_delim,csv_schema))
 
-        return result
+def create_random_csv_object_null(rows,columns,col_delim=",",record_delim="\n",csv_schema="",seed=None):
+        return ''.join(generate_csv_rows(rows,columns,csv_null_value,seed,col_delim,record_delim,csv_schema))
 
 def upload_csv_object(bucket_name,new_key,obj):
 
         client = get_client()
         client.create_bucket(Bucket=bucket_name)
-        client.put_object(Bucket=bucket_name, Key=new_key, Body=obj)
+        response = client.put_object(Bucket=bucket_name, Key=new_key, Body=obj)
 
-        # validate uploaded object
-        c2 = get_client()
-        response = c2.get_object(Bucket=bucket_name, Key=new_key)
-        eq(response['Body'].read().decode('utf-8'), obj, 's3select error[ downloaded object not equal to uploaded objecy')
+        # validate uploaded object by its digest rather than downloading it again
+        expected = hashlib.md5(obj.encode('utf-8')).hexdigest()
+        eq(response['ETag'].strip('"'), expected, 's3select error[ uploaded object digest not equal to local digest')
+
+def upload_csv_object_multipart(bucket_name,new_key,chunks,part_size=5*1024*1024):
+
+        # uploads a (possibly huge) stream of chunks as a multipart object;
+        # returns the object size and md5 of its content
+        client = get_client()
+        client.create_bucket(Bucket=bucket_name)
+        upload_id = client.create_multipart_upload(Bucket=bucket_name, Key=new_key)['UploadId']
+
+        parts = []
+        part_digests = []
+        content_md5 = hashlib.md5()
+        size = 0
+
+        def upload_part(data):
+            part_num = len(parts) + 1
+            response = client.upload_part(UploadId=upload_id, Bucket=bucket_name, Key=new_key, PartNumber=part_num, Body=data)
+            parts.append({'ETag': response['ETag'].strip('"'), 'PartNumber': part_num})
+            part_digests.append(hashlib.md5(data).digest())
+
+        buf = bytearray()
+        for chunk in chunks:
+            buf += chunk
+            content_md5.update(chunk)
+            size += len(chunk)
+            while len(buf) >= part_size:
+                upload_part(bytes(buf[:part_size]))
+                del buf[:part_size]
+
+        if buf or not parts:
+            upload_part(bytes(buf))
+
+        response = client.complete_multipart_upload(Bucket=bucket_name, Key=new_key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+
+        # validate uploaded object by its multipart etag
+        expected = "{}-{}".format(hashlib.md5(b''.join(part_digests)).hexdigest(), len(parts))
+        eq(response['ETag'].strip('"'), expected, 's3select error[ uploaded object digest not equal to local digest')
+
+        return size, content_md5.hexdigest()
+
+def verify_csv_object_digest(bucket_name,key,size,digest):
+
+        # streams the object back and compares its md5 with the one computed on upload
+        client = get_client()
+        response = client.get_object(Bucket=bucket_name, Key=key)
+        eq(response['ContentLength'], size)
+
+        content_md5 = hashlib.md5()
+        for chunk in response['Body'].iter_chunks(1024*1024):
+            content_md5.update(chunk)
+        eq(content_md5.hexdigest(), digest, 's3select error[ downloaded object digest not equal to uploaded object')
 
     
-def run_s3select(bucket,key,query,column_delim=",",row_delim="\n",quot_char='"',esc_char='\\',csv_header_info="NONE"):
+def compress_chunks(chunks,compression):
+
+    # compresses a stream of chunks incrementally, as "GZIP" or "BZIP2" s3select input
+    if compression == "GZIP":
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif compression == "BZIP2":
+        compressor = bz2.BZ2Compressor()
+    else:
+        for chunk in chunks:
+            yield chunk
+        return
 
-    s3 = get_client()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def upload_csv_object_compressed(bucket_name,new_key,obj,compression):
+
+        client = get_client()
+        client.create_bucket(Bucket=bucket_name)
+        body = b''.join(compress_chunks([obj.encode('utf-8')],compression))
+        response = client.put_object(Bucket=bucket_name, Key=new_key, Body=body)
+
+        expected = hashlib.md5(body).hexdigest()
+        eq(response['ETag'].strip('"'), expected, 's3select error[ uploaded object digest not equal to local digest')
+
+def s3select_event_stream(bucket,key,query,column_delim=",",row_delim="\n",quot_char='"',esc_char='\\',csv_header_info="NONE",progress=False,client=None,compression="NONE",scan_range=None):
+
+    s3 = client
+    if s3 is None:
+        s3 = get_client()
+
+    kwargs = {}
+    if progress:
+        kwargs['RequestProgress'] = {"Enabled": True}
+    if scan_range is not None:
+        kwargs['ScanRange'] = {"Start": scan_range[0], "End": scan_range[1]}
 
     r = s3.select_object_content(
         Bucket=bucket,
         Key=key,
         ExpressionType='SQL',
-        InputSerialization = {"CSV": {"RecordDelimiter" : row_delim, "FieldDelimiter" : column_delim,"QuoteEscapeCharacter": esc_char, "QuoteCharacter": quot_char, "FileHeaderInfo": csv_header_info}, "CompressionType": "NONE"},
+        InputSerialization = {"CSV": {"RecordDelimiter" : row_delim, "FieldDelimiter" : column_delim,"QuoteEscapeCharacter": esc_char, "QuoteCharacter": quot_char, "FileHeaderInfo": csv_header_info}, "CompressionType": compression},
         OutputSerialization = {"CSV": {}},
-        Expression=query,)
-    
+        Expression=query,
+        **kwargs)
+
+    return r['Payload']
+
+def run_s3select(bucket,key,query,column_delim=",",row_delim="\n",quot_char='"',esc_char='\\',csv_header_info="NONE",client=None,compression="NONE",scan_range=None):
+
     result = ""
-    for event in r['Payload']:
+    for event in s3select_event_stream(bucket,key,query,column_delim,row_delim,quot_char,esc_char,csv_header_info,client=client,compression=compression,scan_range=scan_range):
         if 'Records' in event:
             records = event['Records']['Payload'].decode('utf-8')
             result += records
     
     return result
 
+def run_s3select_benchmark(bucket,key,query,**kwargs):
+
+    # streams the response without keeping the records; reports the time to the first
+    # record, the total time and the byte counters of the Stats event
+    start = time.perf_counter()
+    first_record = None
+    records_bytes = 0
+    progress_events = 0
+    stats = {}
+
+    for event in s3select_event_stream(bucket,key,query,progress=True,**kwargs):
+        if 'Records' in event:
+            if first_record is None:
+                first_record = time.perf_counter() - start
+            records_bytes += len(event['Records']['Payload'])
+        elif 'Progress' in event:
+            progress_events += 1
+        elif 'Stats' in event:
+            stats = event['Stats']['Details']
+
+    total = time.perf_counter() - start
+    bytes_scanned = stats.get('BytesScanned', 0)
+    bytes_processed = stats.get('BytesProcessed', 0)
+
+    return {
+        'first_record_seconds': first_record if first_record is not None else total,
+        'total_seconds': total,
+        'records_bytes': records_bytes,
+        'progress_events': progress_events,
+        'bytes_scanned': bytes_scanned,
+        'bytes_processed': bytes_processed,
+        'bytes_returned': stats.get('BytesReturned', 0),
+        'scan_mb_per_sec': bytes_scanned / total / (1024*1024),
+        # for compressed input this is the decompression-inclusive throughput
+        'processed_mb_per_sec': bytes_processed / total / (1024*1024),
+        }
+
+def split_scan_ranges(size,num_ranges):
+
+    # splits [0,size) into num_ranges adjacent inclusive (start,end) ranges; a record
+    # belongs to the range it starts in, so every record is processed exactly once
+    step = max(size // num_ranges, 1)
+    starts = list(range(0, size, step))[:num_ranges]
+    ends = [start - 1 for start in starts[1:]] + [size - 1]
+    return list(zip(starts, ends))
+
+def run_s3select_scan_ranges(bucket,key,query,size,num_ranges,concurrency=None,client=None):
+
+    # runs query over each scan range concurrently, returning the per-range results
+    if client is None:
+        client = get_benchmark_client()
+    if concurrency is None:
+        concurrency = num_ranges
+    ranges = split_scan_ranges(size,num_ranges)
+    return run_concurrently(run_s3select,
+            [(bucket,key,query,",","\n",'"','\\',"NONE",client,"NONE",scan_range) for scan_range in ranges],
+            concurrency)
+
+def merge_scan_range_results(results,functions):
+
+    # merges per-range results of an aggregate query; functions names the aggregate
+    # of every projected column, one of count, sum, min or max
+    merged = [None] * len(functions)
+    for res in results:
+        fields = remove_xml_tags_from_result(res).strip().rstrip(",").split(",")
+        for i, (function, field) in enumerate(zip(functions, fields)):
+            field = field.strip()
+            if field == "" or field == "null":
+                continue
+            value = float(field) if "." in field else int(field)
+            if merged[i] is None:
+                merged[i] = value
+            elif function in ("count", "sum"):
+                merged[i] += value
+            elif function == "min":
+                merged[i] = min(merged[i], value)
+            else:
+                merged[i] = max(merged[i], value)
+    return merged
+
 def remove_xml_tags_from_result(obj):
     result = ""
     for rec in obj.split("\n"):
@@ -253,20 +438,6 @@ def remove_xml_tags_from_result(obj):
 
     return result
 
-def create_list_of_int(column_pos,obj,field_split=",",row_split="\n"):
-    
-    list_of_int = [] 
-    for rec in obj.split(row_split):
-        col_num = 1
-        if ( len(rec) == 0):
-            continue
-        for col in rec.split(field_split):
-            if (col_num == column_pos):
-                list_of_int.append(int(col))
-            col_num+=1
-
-    return list_of_int
-       
 @attr('s3select')
 def test_count_operation():
     csv_obj_name = get_random_string()
@@ -278,6 +449,25 @@ def test_count_operation():
 
     s3select_assert_result( num_of_rows, int( res ))
 
+@attr('s3select')
+def test_count_operation_multipart():
+    csv_obj_name = get_random_string()
+    bucket_name = "test"
+    num_of_rows = 300000
+    seed = random.randint(0,1000000)
+
+    chunks = generate_csv_chunks(num_of_rows,10,seed=seed)
+    size, digest = upload_csv_object_multipart(bucket_name,csv_obj_name,chunks)
+    verify_csv_object_digest(bucket_name,csv_obj_name,size,digest)
+
+    res = remove_xml_tags_from_result( run_s3select(bucket_name,csv_obj_name,"select count(0) from s3object;") ).replace(",","")
+    s3select_assert_result( num_of_rows, int( res ))
+
+    # the same seed regenerates the same rows, so the expected sum never has to be held in memory
+    res_target = sum( int(row.split(",")[0]) for row in generate_csv_rows(num_of_rows,10,seed=seed) )
+    res = remove_xml_tags_from_result( run_s3select(bucket_name,csv_obj_name,"select sum(int(_1)) from s3object;") ).replace(",","")
+    s3select_assert_result( res_target, int( res ))
+
 @attr('s3select')
 def test_column_sum_min_max():
     csv_obj = create_random_csv_object(10000,10)
@@ -289,45 +479,48 @@ def test_column_sum_min_max():
     csv_obj_name_2 = get_random_string()
     bucket_name_2 = "testbuck2"
     upload_csv_object(bucket_name_2,csv_obj_name_2,csv_obj)
+
+    # parse the object once, instead of once per checked column
+    table = CsvTable(csv_obj)
     
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name,"select min(int(_1)) from s3object;")  ).replace(",","")
-    list_int = create_list_of_int( 1 , csv_obj )
+    list_int = table.int_column( 1 )
     res_target = min( list_int )
 
     s3select_assert_result( int(res_s3select), int(res_target))
 
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name,"select min(int(_4)) from s3object;")  ).replace(",","")
-    list_int = create_list_of_int( 4 , csv_obj )
+    list_int = table.int_column( 4 )
     res_target = min( list_int )
 
     s3select_assert_result( int(res_s3select), int(res_target))
 
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name,"select avg(int(_6)) from s3object;")  ).replace(",","")
-    list_int = create_list_of_int( 6 , csv_obj )
+    list_int = table.int_column( 6 )
     res_target = float(sum(list_int ))/10000
 
     s3select_assert_result( float(res_s3select), float(res_target))
     
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name,"select max(int(_4)) from s3object;")  ).replace(",","")
-    list_int = create_list_of_int( 4 , csv_obj )
+    list_int = table.int_column( 4 )
     res_target = max( list_int )
 
     s3select_assert_result( int(res_s3select), int(res_target))
     
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name,"select max(int(_7)) from s3object;")  ).replace(",","")
-    list_int = create_list_of_int( 7 , csv_obj )
+    list_int = table.int_column( 7 )
     res_target = max( list_int )
 
     s3select_assert_result( int(res_s3select), int(res_target))
     
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name,"select sum(int(_4)) from s3object;")  ).replace(",","")
-    list_int = create_list_of_int( 4 , csv_obj )
+    list_int = table.int_column( 4 )
     res_target = sum( list_int )
 
     s3select_assert_result( int(res_s3select), int(res_target))
     
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name,"select sum(int(_7)) from s3object;")  ).replace(",","")
-    list_int = create_list_of_int( 7 , csv_obj )
+    list_int = table.int_column( 7 )
     res_target = sum( list_int )
 
     s3select_assert_result(  int(res_s3select) , int(res_target) )
@@ -343,6 +536,91 @@ def test_column_sum_min_max():
 
     s3select_assert_result( int(count)*4 , int(sum1)-int(sum2) )
 
+def s3select_assert_reference(bucket_name,obj_name,table,query,compression="NONE"):
+
+    # the local reference engine answers the same query on the already parsed object
+    res_s3select = remove_xml_tags_from_result( run_s3select(bucket_name,obj_name,query,compression=compression) )
+    res_target = table.query(query)
+
+    assert results_match(res_s3select, res_target), 's3select result for {} differs from reference: {!r}'.format(query, res_target[:10])
+
+REFERENCE_QUERIES = [
+    "select _1,_5 from s3object where int(_1) < 10;",
+    "select count(0) from s3object;",
+    "select count(*),sum(int(_1)),min(int(_2)),max(int(_3)),avg(int(_4)) from s3object;",
+    "select count(0) from s3object where int(_1)+int(_2) > int(_3)*2;",
+    "select sum(int(_1)) from s3object where (int(_1)-int(_2)) % 7 = 3;",
+    "select count(0) from s3object where _1 like '%1%';",
+    "select count(0) from s3object where _1 like '_2_';",
+    "select count(0) from s3object where int(_1) in (1,10,100,200,300,400);",
+    "select count(0),min(int(_2)),max(int(_2)) from s3object where int(_2) between 100 and 199;",
+    "select count(0) from s3object where int(_2) not between 100 and 899;",
+    "select sum(cast(_3 as int)) from s3object where cast(_4 as int) >= 500;",
+    "select cast(_1 as int)*2 from s3object where int(_1) > 990;",
+    ]
+
+@attr('s3select')
+def test_reference_queries():
+    csv_obj = create_random_csv_object(10000,10)
+
+    csv_obj_name = get_random_string()
+    bucket_name = "test"
+    upload_csv_object(bucket_name,csv_obj_name,csv_obj)
+
+    table = CsvTable(csv_obj)
+
+    for query in REFERENCE_QUERIES:
+        s3select_assert_reference(bucket_name,csv_obj_name,table,query)
+
+def _test_compressed_queries(compression):
+    csv_obj = create_random_csv_object(10000,10)
+
+    bucket_name = "test"
+    csv_obj_name = get_random_string()
+    upload_csv_object(bucket_name,csv_obj_name,csv_obj)
+
+    compressed_obj_name = get_random_string()
+    upload_csv_object_compressed(bucket_name,compressed_obj_name,csv_obj,compression)
+
+    table = CsvTable(csv_obj)
+
+    for query in REFERENCE_QUERIES:
+        res_s3select = remove_xml_tags_from_result( run_s3select(bucket_name,csv_obj_name,query) )
+        res_s3select_compressed = remove_xml_tags_from_result( run_s3select(bucket_name,compressed_obj_name,query,compression=compression) )
+        s3select_assert_result( res_s3select_compressed, res_s3select )
+        s3select_assert_reference(bucket_name,compressed_obj_name,table,query,compression)
+
+@attr('s3select')
+def test_gzip_compressed_queries():
+    _test_compressed_queries("GZIP")
+
+@attr('s3select')
+def test_bzip2_compressed_queries():
+    _test_compressed_queries("BZIP2")
+
+SCAN_RANGE_QUERIES = [
+    ('count', "select count(0) from s3object;", ["count"]),
+    ('aggregate', "select count(0),sum(int(_1)),min(int(_2)),max(int(_3)) from s3object;", ["count","sum","min","max"]),
+    ('filter_aggregate', "select count(0),sum(int(_4)) from s3object where int(_1) > int(_2);", ["count","sum"]),
+    ]
+
+@attr('s3select')
+def test_scan_range_aggregates():
+    num_of_rows = 100000
+    csv_obj = create_random_csv_object(num_of_rows,10)
+
+    bucket_name = get_new_bucket()
+    csv_obj_name = get_random_string()
+    upload_csv_object(bucket_name,csv_obj_name,csv_obj)
+    size = len(csv_obj.encode('utf-8'))
+
+    # an odd number of ranges makes sure range edges fall in the middle of records
+    for (query_type, query, functions) in SCAN_RANGE_QUERIES:
+        full_scan = merge_scan_range_results([run_s3select(bucket_name,csv_obj_name,query)],functions)
+        for num_ranges in (1, 7, 64):
+            results = run_s3select_scan_ranges(bucket_name,csv_obj_name,query,size,num_ranges)
+            s3select_assert_result( merge_scan_range_results(results,functions), full_scan )
+
 @attr('s3select')
 def test_nullif_expressions():
 
@@ -716,9 +994,10 @@ def test_complex_expressions():
 
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name,"select min(int(_1)),max(int(_2)),min(int(_3))+1 from s3object;")).replace("\n","")
 
-    min_1 = min ( create_list_of_int( 1 , csv_obj ) )
-    max_2 = max ( create_list_of_int( 2 , csv_obj ) )
-    min_3 = min ( create_list_of_int( 3 , csv_obj ) ) + 1
+    table = CsvTable(csv_obj)
+    min_1 = min ( table.int_column( 1 ) )
+    max_2 = max ( table.int_column( 2 ) )
+    min_3 = min ( table.int_column( 3 ) ) + 1
 
     __res = "{},{},{},".format(min_1,max_2,min_3)
     
@@ -904,9 +1183,10 @@ def test_csv_definition():
     # purpose of test is validate that tokens are processed correctly
     res_s3select = remove_xml_tags_from_result( run_s3select(bucket_name,csv_obj_name,"select min(int(_1)),max(int(_2)),min(int(_3))+1 from s3object;","|","\t") ).replace("\n","")
 
-    min_1 = min ( create_list_of_int( 1 , csv_obj , "|","\t") )
-    max_2 = max ( create_list_of_int( 2 , csv_obj , "|","\t") )
-    min_3 = min ( create_list_of_int( 3 , csv_obj , "|","\t") ) + 1
+    table = CsvTable(csv_obj, "|", "\t")
+    min_1 = min ( table.int_column( 1 ) )
+    max_2 = max ( table.int_column( 2 ) )
+    min_3 = min ( table.int_column( 3 ) ) + 1
 
     __res = "{},{},{},".format(min_1,max_2,min_3)
     s3select_assert_result( res_s3select, __res )
@@ -1162,3 +1442,194 @@ def test_bool_cast_expressions():
     res_s3select = remove_xml_tags_from_result(  run_s3select(bucket_name,csv_obj_name, 'select count(*) from s3object where cast(_1 as int) != 0 ;')).replace("\n","")
 
     s3select_assert_result( res_s3select_cast, res_s3select )
+
+S3SELECT_BENCHMARK_QUERIES = [
+    ('count', "select count(0) from s3object;"),
+    ('aggregate', "select sum(int(_1)),min(int(_2)),max(int(_3)),avg(int(_4)) from s3object where int(_5) > 500;"),
+    ('filter_small_output', "select _1,_2 from s3object where int(_1) < 10;"),
+    ('filter_large_output', "select _1,_2,_3 from s3object where int(_1) >= 100;"),
+    ('projection_all', "select * from s3object;"),
+    ]
+
+def _test_s3select_benchmark(num_of_rows):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket_name()
+    csv_obj_name = get_random_string()
+    chunks = generate_csv_chunks(num_of_rows,10,seed=num_of_rows)
+    size, digest = upload_csv_object_multipart(bucket_name,csv_obj_name,chunks)
+
+    for (query_type, query) in S3SELECT_BENCHMARK_QUERIES:
+        result = run_s3select_benchmark(bucket_name,csv_obj_name,query)
+        if result['bytes_scanned']:
+            eq(result['bytes_scanned'], size)
+        print_benchmark_report('s3select',
+                rows=num_of_rows,
+                object_size=size,
+                query_type=query_type,
+                **result)
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_benchmark_10k_rows():
+    _test_s3select_benchmark(10000)
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_benchmark_100k_rows():
+    _test_s3select_benchmark(100000)
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_benchmark_1m_rows():
+    _test_s3select_benchmark(1000000)
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_benchmark_10m_rows():
+    _test_s3select_benchmark(10000000)
+
+def check_s3select_generated_query(client,bucket_name,obj_name,kind,s3select_stmt,expected):
+
+    # runs one generated statement and compares it with the python evaluation;
+    # returns (latency, failure description or None) instead of asserting
+    start = time.perf_counter()
+    try:
+        res = run_s3select(bucket_name,obj_name,s3select_stmt,client=client)
+    except Exception as e:
+        return time.perf_counter() - start, 'error {!r}'.format(e)
+    latency = time.perf_counter() - start
+
+    try:
+        res = remove_xml_tags_from_result(res)
+    except AssertionError:
+        return latency, 'failure {!r}'.format(res)
+    values = [rec.strip() for rec in res.replace(",","").split("\n") if rec.strip() != ""]
+    if len(values) != 1:
+        return latency, 'unexpected result {!r}'.format(res)
+    try:
+        if kind == 'where':
+            ok = (int(values[0]) > 0) == expected
+        else:
+            ok = (1 - (float(values[0]) / expected)) < 0.000001
+    except ValueError:
+        ok = False
+    if not ok:
+        return latency, 'got {!r} expected {!r}'.format(values[0], expected)
+    return latency, None
+
+def _test_s3select_generated_fanout(num_of_queries):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    # one tiny object is enough, the expressions do not reference any column
+    bucket_name = get_new_bucket_name()
+    obj_name = get_random_string()
+    upload_csv_object(bucket_name,obj_name,create_random_csv_object(1,1))
+
+    checks = []
+    while len(checks) < num_of_queries:
+        kind = random.choice(['where', 'projection'])
+        if kind == 'where':
+            generated = make_s3select_where_clause()
+        else:
+            generated = make_s3select_expression_projection()
+        if generated is not None:
+            checks.append((kind,) + generated)
+
+    client = get_benchmark_client()
+    results = run_concurrently(check_s3select_generated_query,
+            [(client,bucket_name,obj_name,kind,stmt,expected) for (kind,stmt,expected) in checks],
+            get_benchmark_concurrency())
+
+    failures = [(stmt, failure) for ((kind,stmt,expected), (latency,failure)) in zip(checks, results) if failure is not None]
+    for (stmt, failure) in failures:
+        logging.info('s3select generated query failed: {} : {}'.format(stmt, failure))
+
+    print_benchmark_report('s3select_generated_fanout',
+            queries=num_of_queries,
+            concurrency=get_benchmark_concurrency(),
+            failures=len(failures),
+            **summarize_latencies([latency for (latency, failure) in results]))
+
+    eq(failures, [])
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_generated_fanout():
+    _test_s3select_generated_fanout(5000)
+
+def _test_s3select_compressed_benchmark(num_of_rows):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket_name()
+
+    for compression in ("NONE", "GZIP", "BZIP2"):
+        csv_obj_name = get_random_string()
+        # the same seed for every compression type, so all of them scan the same content
+        chunks = compress_chunks(generate_csv_chunks(num_of_rows,10,seed=num_of_rows),compression)
+        size, digest = upload_csv_object_multipart(bucket_name,csv_obj_name,chunks)
+
+        for (query_type, query) in S3SELECT_BENCHMARK_QUERIES:
+            result = run_s3select_benchmark(bucket_name,csv_obj_name,query,compression=compression)
+            print_benchmark_report('s3select_compressed',
+                    rows=num_of_rows,
+                    compression=compression,
+                    object_size=size,
+                    query_type=query_type,
+                    **result)
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_compressed_benchmark_100k_rows():
+    _test_s3select_compressed_benchmark(100000)
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_compressed_benchmark_1m_rows():
+    _test_s3select_compressed_benchmark(1000000)
+
+def _test_s3select_scan_range_benchmark(num_of_rows):
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    bucket_name = get_new_bucket_name()
+    csv_obj_name = get_random_string()
+    chunks = generate_csv_chunks(num_of_rows,10,seed=num_of_rows)
+    size, digest = upload_csv_object_multipart(bucket_name,csv_obj_name,chunks)
+
+    client = get_benchmark_client()
+    concurrency = get_benchmark_concurrency()
+
+    for (query_type, query, functions) in SCAN_RANGE_QUERIES:
+        start = time.perf_counter()
+        full_scan = merge_scan_range_results([run_s3select(bucket_name,csv_obj_name,query,client=client)],functions)
+        full_scan_seconds = time.perf_counter() - start
+
+        for num_ranges in (2, 4, 8, 16, 32):
+            start = time.perf_counter()
+            results = run_s3select_scan_ranges(bucket_name,csv_obj_name,query,size,num_ranges,concurrency,client)
+            merged = merge_scan_range_results(results,functions)
+            seconds = time.perf_counter() - start
+
+            eq(merged, full_scan)
+            print_benchmark_report('s3select_scan_range',
+                    rows=num_of_rows,
+                    object_size=size,
+                    query_type=query_type,
+                    scan_ranges=num_ranges,
+                    full_scan_seconds=full_scan_seconds,
+                    seconds=seconds,
+                    speedup=full_scan_seconds / seconds)
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_scan_range_benchmark_1m_rows():
+    _test_s3select_scan_range_benchmark(1000000)
+
+@attr('s3select')
+@attr('benchmark')
+def test_s3select_scan_range_benchmark_10m_rows():
+    _test_s3select_scan_range_benchmark(10000000)
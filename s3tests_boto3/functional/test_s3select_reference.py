@@ -0,0 +1,37 @@
+from nose.tools import eq_ as eq
+
+from .s3select_reference import CsvTable, results_match
+
+CSV_OBJ = "1,10,abc,\n2,20,abd,\n3,30,xyz,\n4,,abc,\n"
+
+def test_reference_projection():
+    table = CsvTable(CSV_OBJ)
+    eq(table.num_rows, 4)
+    eq(table.query("select _1,_3 from s3object where int(_1) > 2;"), [('3', 'xyz'), ('4', 'abc')])
+    eq(table.query("select int(_1)*2+1 from s3object where _3 = 'abc';"), [(3,), (9,)])
+
+def test_reference_aggregates():
+    table = CsvTable(CSV_OBJ)
+    eq(table.query("select count(*),sum(int(_2)),min(int(_2)),max(int(_2)) from s3object;"), [(4, 60, 10, 30)])
+    eq(table.query("select avg(int(_1)) from s3object where _2 is not null;"), [(2.0,)])
+    eq(table.query("select count(0) from s3object where int(_1) > 10;"), [(0,)])
+
+def test_reference_predicates():
+    table = CsvTable(CSV_OBJ)
+    eq(table.query("select count(0) from s3object where _3 like 'ab%';"), [(3,)])
+    eq(table.query("select count(0) from s3object where _3 not like '_b_';"), [(1,)])
+    eq(table.query("select count(0) from s3object where int(_1) in (1,3,5);"), [(2,)])
+    eq(table.query("select count(0) from s3object where cast(_1 as int) between 2 and 3;"), [(2,)])
+    eq(table.query("select _1 from s3object where (int(_1) - 1) / 2 = 1 or _3 = \"xyz\";"), [('3',), ('4',)])
+
+def test_reference_negative_operands():
+    table = CsvTable("1,5,\n-7,2,\n7,-2,\n")
+    eq(table.query("select (int(_1)-int(_2)) % 7 from s3object;"), [(-4,), (-2,), (2,)])
+    eq(table.query("select int(_1) % int(_2), int(_1) / int(_2) from s3object;"), [(1, 0), (-1, -3), (1, -3)])
+    eq(table.query("select count(0) from s3object where (int(_1)-int(_2)) % 7 = 3;"), [(0,)])
+
+def test_reference_results_match():
+    table = CsvTable(CSV_OBJ)
+    eq(results_match("4,60,\n", table.query("select count(*),sum(int(_2)) from s3object;")), True)
+    eq(results_match("2.0000001,\n", table.query("select avg(int(_1)) from s3object where _2 is not null;")), True)
+    eq(results_match("5,60,\n", table.query("select count(*),sum(int(_2)) from s3object;")), False)
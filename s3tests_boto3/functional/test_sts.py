@@ -1,5 +1,6 @@
 import boto3
 import botocore.session
+from botocore.client import Config
 from botocore.exceptions import ClientError
 from botocore.exceptions import ParamValidationError
 from nose.tools import eq_ as eq
@@ -50,9 +51,19 @@ from . import(
     get_iam_secret_key,
     get_sub,
     get_azp,
-    get_user_token
+    get_user_token,
+    get_benchmark_client,
+    get_benchmark_enabled,
+    get_benchmark_concurrency,
+    get_oidc_provider,
     )
 
+from .utils import run_concurrently
+from .utils import timed_call
+from .utils import put_get_latencies
+from .utils import summarize_latencies
+from .utils import print_benchmark_report
+
 log = logging.getLogger(__name__)
 
 def create_role(iam_client,path,rolename,policy_document,description,sessionduration,permissionboundary,tag_list=None):
@@ -2169,3 +2180,169 @@ def test_assume_role_with_web_identity_role_resource_tag():
     oidc_remove=iam_client.delete_open_id_connect_provider(
     OpenIDConnectProviderArn=oidc_response["OpenIDConnectProviderArn"]
     )
+
+def _get_pooled_client_config():
+    return Config(signature_version='s3v4', max_pool_connections=get_benchmark_concurrency())
+
+def _get_s3_client_from_credentials(credentials):
+    return boto3.client('s3',
+        aws_access_key_id = credentials['AccessKeyId'],
+        aws_secret_access_key = credentials['SecretAccessKey'],
+        aws_session_token = credentials['SessionToken'],
+        endpoint_url=get_config_endpoint(),
+        region_name='',
+        config=_get_pooled_client_config(),
+        )
+
+def _s3_op_latencies(s3_clients, bucket_name, num_ops):
+    """
+    returns the put and get latencies of num_ops small object put/gets
+    spread over s3_clients
+    """
+    samples = put_get_latencies(s3_clients, bucket_name, num_ops, get_benchmark_concurrency())
+    return ([latency for (tag, kind, latency) in samples if kind == 'put'],
+            [latency for (tag, kind, latency) in samples if kind == 'get'])
+
+def _test_sts_load(sts_call, name, num_calls=1000, num_sessions=4, num_ops=5000):
+    """
+    issue num_calls concurrent STS calls through sts_call, then drive s3
+    requests with num_sessions of the returned credentials and compare
+    them with the same requests signed by long-term keys
+    """
+    concurrency = get_benchmark_concurrency()
+
+    results = run_concurrently(timed_call, [(sts_call,) for i in range(num_calls)], concurrency)
+    sts_latencies = [latency for (latency, response) in results]
+    for (latency, response) in results:
+        eq(response['ResponseMetadata']['HTTPStatusCode'],200)
+
+    print_benchmark_report(name,
+            calls=num_calls,
+            concurrency=concurrency,
+            **summarize_latencies(sts_latencies))
+
+    s3_clients = [_get_s3_client_from_credentials(response['Credentials']) for (latency, response) in results[:num_sessions]]
+    bucket_name = get_new_bucket_name()
+    s3_clients[0].create_bucket(Bucket=bucket_name)
+    (put_latencies, get_latencies) = _s3_op_latencies(s3_clients, bucket_name, num_ops)
+
+    main_client = get_benchmark_client()
+    main_bucket_name = get_new_bucket_name()
+    main_client.create_bucket(Bucket=main_bucket_name)
+    (main_put_latencies, main_get_latencies) = _s3_op_latencies([main_client], main_bucket_name, num_ops)
+
+    for (credentials, op, latencies) in [
+            ('temporary', 'put', put_latencies),
+            ('temporary', 'get', get_latencies),
+            ('long_term', 'put', main_put_latencies),
+            ('long_term', 'get', main_get_latencies),
+            ]:
+        print_benchmark_report(name + '_s3',
+                credentials=credentials,
+                op=op,
+                **summarize_latencies(latencies))
+
+@attr(resource='assume role')
+@attr(method='get')
+@attr(operation='concurrent assume role calls, s3 ops with the temporary credentials')
+@attr(assertion='succeeds')
+@attr('test_of_sts')
+@attr('benchmark')
+def test_assume_role_load():
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    iam_client=get_iam_client()
+    sts_client=get_sts_client(_get_pooled_client_config())
+    sts_user_id=get_alt_user_id()
+    role_session_name=get_parameter_name()
+
+    policy_document = "{\"Version\":\"2012-10-17\",\"Statement\":[{\"Effect\":\"Allow\",\"Principal\":{\"AWS\":[\"arn:aws:iam:::user/"+sts_user_id+"\"]},\"Action\":[\"sts:AssumeRole\"]}]}"
+    (role_error,role_response,general_role_name)=create_role(iam_client,'/',None,policy_document,None,None,None)
+    eq(role_response['Role']['Arn'],'arn:aws:iam:::role/'+general_role_name+'')
+
+    role_policy = "{\"Version\":\"2012-10-17\",\"Statement\":{\"Effect\":\"Allow\",\"Action\":\"s3:*\",\"Resource\":\"arn:aws:s3:::*\"}}"
+    (role_err,response)=put_role_policy(iam_client,general_role_name,None,role_policy)
+    eq(response['ResponseMetadata']['HTTPStatusCode'],200)
+
+    def assume_role():
+        return sts_client.assume_role(RoleArn=role_response['Role']['Arn'],RoleSessionName=role_session_name)
+
+    _test_sts_load(assume_role, 'sts_assume_role')
+
+@attr(resource='get session token')
+@attr(method='get')
+@attr(operation='concurrent get session token calls, s3 ops with the temporary credentials')
+@attr(assertion='succeeds')
+@attr('test_of_sts')
+@attr('benchmark')
+def test_get_session_token_load():
+    if not get_benchmark_enabled():
+        raise SkipTest
+
+    iam_client=get_iam_client()
+    sts_client=get_sts_client(_get_pooled_client_config())
+    sts_user_id=get_alt_user_id()
+
+    user_policy = "{\"Version\":\"2012-10-17\",\"Statement\":[{\"Effect\":\"Deny\",\"Action\":\"s3:*\",\"Resource\":[\"*\"],\"Condition\":{\"BoolIfExists\":{\"sts:authentication\":\"false\"}}},{\"Effect\":\"Allow\",\"Action\":\"sts:GetSessionToken\",\"Resource\":\"*\",\"Condition\":{\"BoolIfExists\":{\"sts:authentication\":\"false\"}}}]}"
+    (resp_err,resp)=put_user_policy(iam_client,sts_user_id,None,user_policy)
+    eq(resp['ResponseMetadata']['HTTPStatusCode'],200)
+
+    _test_sts_load(sts_client.get_session_token, 'sts_get_session_token')
+
+@attr(resource='assume role with web identity')
+@attr(method='get')
+@attr(operation='concurrent assume role with web identity calls with distinct tokens')
+@attr(assertion='succeeds')
+@attr('webidentity_test')
+@attr('benchmark')
+def test_assume_role_with_web_identity_load():
+    check_webidentity()
+    provider = get_oidc_provider()
+    if not get_benchmark_enabled() or provider is None:
+        raise SkipTest
+
+    iam_client=get_iam_client()
+    sts_client=get_sts_client(_get_pooled_client_config())
+    role_session_name=get_parameter_name()
+    thumbprint=get_thumbprint()
+    aud=get_aud()
+    realm=get_realm_name()
+    num_calls = 1000
+    concurrency = get_benchmark_concurrency()
+
+    oidc_response = iam_client.create_open_id_connect_provider(
+    Url='http://localhost:8080/auth/realms/{}'.format(realm),
+    ThumbprintList=[
+        thumbprint,
+    ],
+    )
+
+    policy_document = "{\"Version\":\"2012-10-17\",\"Statement\":[{\"Effect\":\"Allow\",\"Principal\":{\"Federated\":[\""+oidc_response["OpenIDConnectProviderArn"]+"\"]},\"Action\":[\"sts:AssumeRoleWithWebIdentity\"],\"Condition\":{\"StringEquals\":{\"localhost:8080/auth/realms/"+realm+":app_id\":\""+aud+"\"}}}]}"
+    (role_error,role_response,general_role_name)=create_role(iam_client,'/',None,policy_document,None,None,None)
+    eq(role_response['Role']['Arn'],'arn:aws:iam:::role/'+general_role_name+'')
+
+    role_policy = "{\"Version\":\"2012-10-17\",\"Statement\":{\"Effect\":\"Allow\",\"Action\":\"s3:*\",\"Resource\":\"arn:aws:s3:::*\"}}"
+    (role_err,response)=put_role_policy(iam_client,general_role_name,None,role_policy)
+    eq(response['ResponseMetadata']['HTTPStatusCode'],200)
+
+    # every call presents a distinct token, so the gateway cannot serve validation from a cache
+    (mint_seconds, tokens) = timed_call(lambda: [provider.mint_token(sub='user{}'.format(i)) for i in range(num_calls)])
+
+    def assume_role(token):
+        return sts_client.assume_role_with_web_identity(RoleArn=role_response['Role']['Arn'],RoleSessionName=role_session_name,WebIdentityToken=token)
+
+    (seconds, results) = timed_call(run_concurrently, lambda token: timed_call(assume_role, token), [(token,) for token in tokens], concurrency)
+    for (latency, resp) in results:
+        eq(resp['ResponseMetadata']['HTTPStatusCode'],200)
+
+    print_benchmark_report('sts_assume_role_with_web_identity',
+            calls=num_calls,
+            concurrency=concurrency,
+            tokens_minted_per_sec=num_calls / mint_seconds,
+            calls_per_sec=num_calls / seconds,
+            **summarize_latencies([latency for (latency, resp) in results]))
+
+    oidc_remove=iam_client.delete_open_id_connect_provider(
+    OpenIDConnectProviderArn=oidc_response["OpenIDConnectProviderArn"]
+    )
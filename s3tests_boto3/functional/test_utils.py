@@ -1,3 +1,4 @@
+import io
 from nose.tools import eq_ as eq
 
 from . import utils
@@ -9,3 +10,31 @@ def test_generate():
     eq(len(''.join(utils.generate_random(FIVE_MB - 1))), FIVE_MB - 1)
     eq(len(''.join(utils.generate_random(FIVE_MB))), FIVE_MB)
     eq(len(''.join(utils.generate_random(FIVE_MB + 1))), FIVE_MB + 1)
+
+def test_percentile():
+    samples = [float(i) for i in range(1, 101)]
+    eq(utils.percentile(samples, 50), 50.0)
+    eq(utils.percentile(samples, 99), 99.0)
+    eq(utils.percentile(samples, 100), 100.0)
+    eq(utils.percentile([3.0], 99), 3.0)
+    eq(utils.percentile([], 50), 0.0)
+
+class _FakeClient(object):
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objects[Key])}
+
+def test_put_get_latencies():
+    clients = [_FakeClient(), _FakeClient()]
+    samples = utils.put_get_latencies(clients, 'bucket', 10, 2, tags=['a', 'b'])
+    eq(len(samples), 20)
+    eq(sorted(set((tag, kind) for (tag, kind, latency) in samples)),
+       [('a', 'get'), ('a', 'put'), ('b', 'get'), ('b', 'put')])
+    eq(len(clients[0].objects), 5)
+    samples = utils.put_get_latencies(clients[:1], 'bucket', 3, 1)
+    eq(set(tag for (tag, kind, latency) in samples), set([None]))
@@ -1,3 +1,5 @@
+import concurrent.futures
+import math
 import random
 import requests
 import string
@@ -47,3 +49,88 @@ def _get_status_and_error_code(response):
     status = response['ResponseMetadata']['HTTPStatusCode']
     error_code = response['Error']['Code']
     return status, error_code
+
+def run_concurrently(func, args_list, concurrency):
+    """
+    Call func once for every argument tuple in args_list, using up to
+    concurrency worker threads. Returns the results in args_list order;
+    the first exception raised by any call is re-raised.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(func, *args) for args in args_list]
+        return [f.result() for f in futures]
+
+def timed_call(func, *args, **kwargs):
+    """
+    Call func and return a (seconds elapsed, result) tuple.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return (time.perf_counter() - start, result)
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of samples, pct given in 0..100.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def summarize_latencies(samples):
+    """
+    Reduce a list of latencies (in seconds) to the statistics we report.
+    """
+    count = len(samples)
+    return {
+        'count': count,
+        'mean': sum(samples) / count if count else 0.0,
+        'p50': percentile(samples, 50),
+        'p90': percentile(samples, 90),
+        'p99': percentile(samples, 99),
+        'max': max(samples) if count else 0.0,
+        }
+
+def group_latencies(samples):
+    """
+    Split (key, latency) samples into a dict of key -> list of latencies,
+    e.g. to report latency per endpoint.
+    """
+    groups = {}
+    for (key, latency) in samples:
+        groups.setdefault(key, []).append(latency)
+    return groups
+
+def put_get_latencies(clients, bucket_name, num_ops, concurrency, tags=None):
+    """
+    put and then get a 1KB object num_ops times over 64 keys, spreading
+    the requests round-robin over clients (which are reused, not rebuilt
+    per request). Returns (tag, 'put' or 'get', latency) samples, where
+    tag is the entry of tags matching the client used, or None.
+    """
+    body = b'x' * 1024
+
+    def op(i):
+        client = clients[i % len(clients)]
+        tag = tags[i % len(clients)] if tags is not None else None
+        key = 'obj{}'.format(i % 64)
+        (put_latency, response) = timed_call(client.put_object, Bucket=bucket_name, Key=key, Body=body)
+        (get_latency, response) = timed_call(client.get_object, Bucket=bucket_name, Key=key)
+        response['Body'].read()
+        return [(tag, 'put', put_latency), (tag, 'get', get_latency)]
+
+    results = run_concurrently(op, [(i,) for i in range(num_ops)], concurrency)
+    return [sample for samples in results for sample in samples]
+
+def print_benchmark_report(name, **fields):
+    """
+    Print one benchmark result line; run nose with -s to see them.
+    """
+    values = []
+    for k in sorted(fields):
+        v = fields[k]
+        if isinstance(v, float):
+            v = '{:.6f}'.format(v)
+        values.append('{}={}'.format(k, v))
+    print('BENCHMARK {} {}'.format(name, ' '.join(values)))